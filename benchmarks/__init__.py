@@ -0,0 +1 @@
+"""Benchmarks of truman, run with airspeed velocity (asv)."""
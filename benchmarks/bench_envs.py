@@ -0,0 +1,123 @@
+"""Benchmarks of env step throughput."""
+import time
+
+import numpy as np
+
+import truman
+from truman import single_interaction_step, time_period_step
+
+
+NUM_STEPS = 10_000
+# Registered env whose kwargs the batch env benchmarks are made with
+ENV_ID = "TimePeriodStep:Static:conv_1:0.2:conv_2:0.3-v0"
+
+
+def _steps_per_second(env, actions) -> float:
+    start = time.perf_counter()
+    for action in actions:
+        env.step(action)
+    return len(actions) / (time.perf_counter() - start)
+
+
+class TimePeriodStep:
+    """Step throughput of each registered time period step env."""
+
+    params = [
+        [spec.id for spec in truman.registry.all() if spec.id.startswith("TimePeriodStep:")],
+        [False, True],
+    ]
+    param_names = ["env_id", "precompute_behaviour"]
+    unit = "steps/s"
+
+    def setup(self, env_id, precompute_behaviour):
+        self.env = truman.registry.env_specs[env_id].make(
+            precompute_behaviour=precompute_behaviour
+        )
+        self.actions = [self.env.action_space.sample() for _ in range(self.env.episode_length)]
+
+    def track_steps_per_second(self, env_id, precompute_behaviour):
+        self.env.reset()
+        return _steps_per_second(self.env, self.actions)
+
+    def time_episode(self, env_id, precompute_behaviour):
+        self.env.reset()
+        for action in self.actions:
+            self.env.step(action)
+
+
+class DiscreteStrategyBinomialBatch:
+    """Replica step throughput of the batch time period step env."""
+
+    params = [1, 100, 1000]
+    param_names = ["num_replicas"]
+    unit = "replica steps/s"
+
+    def setup(self, num_replicas):
+        kwargs = truman.registry.env_specs[ENV_ID]._kwargs
+        self.env = time_period_step.DiscreteStrategyBinomialBatch(num_replicas, **kwargs)
+        self.actions = np.random.randint(2, size=(self.env.episode_length, num_replicas))
+
+    def track_replica_steps_per_second(self, num_replicas):
+        self.env.reset()
+        return num_replicas * _steps_per_second(self.env, self.actions)
+
+
+class SingleInteractionStep:
+    """Step throughput of the single interaction step envs."""
+
+    params = ["BasicDiscreteBernoulliBandits", "HeirarchicalStaticBernoulliBandits"]
+    param_names = ["env"]
+    unit = "steps/s"
+
+    def setup(self, env):
+        bandits = [single_interaction_step.Bandit(0.01), single_interaction_step.Bandit(0.02)]
+        if env == "BasicDiscreteBernoulliBandits":
+            self.env = single_interaction_step.BasicDiscreteBernoulliBandits(bandits)
+        else:
+            context = {"country": {"uk": 1.0, "fr": 1.2}, "device": {"mobile": 0.8, "pc": 1.0}}
+            self.env = single_interaction_step.HeirarchicalStaticBernoulliBandits(bandits, context)
+        self.actions = [self.env.action_space.sample() for _ in range(NUM_STEPS)]
+
+    def track_steps_per_second(self, env):
+        return _steps_per_second(self.env, self.actions)
+
+    def track_step_many_steps_per_second(self, env):
+        actions = np.array(self.actions)
+        start = time.perf_counter()
+        self.env.step_many(actions)
+        return len(actions) / (time.perf_counter() - start)
+
+
+class TimestepContextualBernoulliBandits:
+    """Step throughput of the timestep contextual bandits env."""
+
+    unit = "steps/s"
+
+    def setup(self):
+        self.env = single_interaction_step.weekly_with_trend()
+        self.actions = [self.env.action_space.sample() for _ in range(NUM_STEPS)]
+
+    def track_steps_per_second(self):
+        return _steps_per_second(self.env, self.actions)
+
+
+class RandomWalkTrend:
+    """Throughput of the random walk trend's trajectory, with default and tight bounds."""
+
+    params = [[(0.8, 1.2), (1.0, 1.01)], [4096, 40960]]
+    param_names = ["bounds", "num_steps"]
+    unit = "steps/s"
+
+    def setup(self, bounds, num_steps):
+        self.random_walk = single_interaction_step.RandomWalkTrend(*bounds, 0.01, seed=2021)
+
+    def track_trajectory_steps_per_second(self, bounds, num_steps):
+        start = time.perf_counter()
+        self.random_walk.trajectory(num_steps)
+        return num_steps / (time.perf_counter() - start)
+
+    def track_step_steps_per_second(self, bounds, num_steps):
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            self.random_walk.step()
+        return num_steps / (time.perf_counter() - start)
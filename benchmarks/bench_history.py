@@ -0,0 +1,69 @@
+"""Benchmarks of recording, converting and storing histories."""
+import os
+import tempfile
+
+import gym
+import numpy as np
+import pandas as pd
+
+from truman import history
+
+
+NUM_STEPS = 100_000
+INFO = {"interaction_prb": 0.5, "conversion_prb": 0.02}
+
+
+def _make_history(backend: str) -> history.History:
+    if backend == "columnar":
+        return history.ColumnarHistory(
+            observation_space=gym.spaces.Box(low=0, high=999999, shape=(2,), dtype=int),
+            action_space=gym.spaces.Discrete(2),
+            capacity=NUM_STEPS + 1,
+        )
+    return history.History()
+
+
+def _record(hist: history.History) -> history.History:
+    observation = np.array([5000, 100])
+    hist.append(None, observation, None, None, None, None)
+    for i in range(NUM_STEPS):
+        hist.append(i % 2, observation, 100.0, False, INFO, {})
+    return hist
+
+
+class History:
+    """Recording a long episode, and converting it to a dataframe."""
+
+    params = ["list", "columnar"]
+    param_names = ["backend"]
+
+    def setup(self, backend):
+        self.history = _record(_make_history(backend))
+
+    def time_append(self, backend):
+        _record(_make_history(backend))
+
+    def peakmem_append(self, backend):
+        _record(_make_history(backend))
+
+    def time_to_df(self, backend):
+        self.history.to_df()
+
+
+class Parquet:
+    """Writing and reading a long episode's history."""
+
+    def setup(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.parquet")
+        self.df = _record(history.History()).to_df()
+        self.df.to_parquet(self.path)
+
+    def teardown(self):
+        self.directory.cleanup()
+
+    def time_write(self):
+        self.df.to_parquet(self.path)
+
+    def time_read(self):
+        pd.read_parquet(self.path)
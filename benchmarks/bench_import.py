@@ -0,0 +1,11 @@
+"""Benchmarks of import times, paid by every process that runs truman."""
+
+
+class Import:
+    """Importing truman, and creating its env registry, in a fresh interpreter."""
+
+    def timeraw_import_truman(self):
+        return "import truman"
+
+    def timeraw_create_registry(self):
+        return "truman.registry", "import truman"
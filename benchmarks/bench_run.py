@@ -0,0 +1,113 @@
+"""Benchmarks of running suites of agents on suites of envs end-to-end."""
+import tempfile
+
+import numpy as np
+from gym.envs.registration import EnvRegistry
+
+import truman
+from truman import time_period_step
+from truman.agent_registration import AgentRegistry
+from truman.batch_agent import BatchedAgent
+from truman.run import simulation
+
+
+# Registered env whose kwargs the batch env benchmarks are made with
+ENV_ID = "TimePeriodStep:Static:conv_1:0.2:conv_2:0.3-v0"
+
+
+class AlternatingAgent:
+    """Alternates between two actions, at negligible cost, so the benchmark is of truman."""
+
+    def __init__(self, env):
+        self.action = 0
+
+    def act(self, previous_observation):
+        self.action = 1 - self.action
+        return self.action, {}
+
+
+class Run:
+    """Throughput of truman.run over the registered time period step envs."""
+
+    params = ["list", "columnar"]
+    param_names = ["history_backend"]
+    timeout = 300
+
+    def setup(self, history_backend):
+        self.agent_suite = AgentRegistry()
+        self.agent_suite.register("Alternating-v0", entry_point=AlternatingAgent)
+        self.env_suite = EnvRegistry()
+        self.env_suite.env_specs = {
+            spec.id: spec
+            for spec in truman.registry.all()
+            if spec.id.startswith("TimePeriodStep:")
+        }
+        self.directory = tempfile.TemporaryDirectory()
+
+    def teardown(self, history_backend):
+        self.directory.cleanup()
+
+    def time_run(self, history_backend):
+        truman.run(
+            self.agent_suite,
+            [self.env_suite],
+            {"output_directory": self.directory.name, "history_backend": history_backend},
+        )
+
+
+class AlternatingBatchAgent:
+    """Alternates between two actions for every replica at once."""
+
+    def __init__(self, num_replicas):
+        self.actions = np.zeros(num_replicas, dtype=int)
+
+    def act_batch(self, previous_observations):
+        self.actions = 1 - self.actions
+        return self.actions, {}
+
+
+class RunBatch:
+    """Throughput of simulation.run of an episode of many env replicas, stepped together."""
+
+    params = [[10, 100], ["batch", "batched_scalar"]]
+    param_names = ["num_replicas", "agent"]
+
+    def setup(self, num_replicas, agent):
+        kwargs = truman.registry.env_specs[ENV_ID]._kwargs
+        self.env = time_period_step.DiscreteStrategyBinomialBatch(num_replicas, **kwargs)
+        if agent == "batch":
+            self.agent = AlternatingBatchAgent(num_replicas)
+        else:
+            self.agent = BatchedAgent.from_factory(AlternatingAgent, num_replicas)
+
+    def time_run(self, num_replicas, agent):
+        simulation.run(self.agent, self.env, {"max_iters": 100_000})
+
+
+class RunBranches:
+    """Running counterfactual branches from late in an episode, restored or replayed to there."""
+
+    params = [[2, 10]]
+    param_names = ["num_branches"]
+
+    def setup(self, num_branches):
+        self.agent = AlternatingAgent(None)
+        self.env = truman.registry.env_specs[ENV_ID].make()
+        self.observation = self.env.reset(seed=0)
+        for _ in range(300):
+            self.observation, _, _, _ = self.env.step(self.agent.act(self.observation)[0])
+        self.actions = [branch % 2 for branch in range(num_branches)]
+
+    def time_run_branches(self, num_branches):
+        simulation.run_branches(
+            self.agent, self.env, {"max_iters": 100_000}, self.observation, self.actions
+        )
+
+    def time_replay_branches(self, num_branches):
+        # Replays the episode up to the branch for each branch, and records the branch as above
+        for action in self.actions:
+            agent = AlternatingAgent(None)
+            observation = self.env.reset(seed=0)
+            for _ in range(300):
+                observation, _, _, _ = self.env.step(agent.act(observation)[0])
+            simulation.run_branches(agent, self.env, {"max_iters": 100_000}, observation, [action])
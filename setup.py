@@ -14,7 +14,7 @@ REQUIREMENTS = [
     "numpy",
     "gym",
     "pandas",
-    "pyarrow",
+    "pyarrow>=6",
 ]
 
 setup(
@@ -27,7 +27,7 @@ setup(
     author_email="opensource@datavaluepeople.com",
     url="https://github.com/datavaluepeople/truman",
     license="MIT",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     install_requires=REQUIREMENTS,
     python_requires=">=3.7",
     cmdclass=versioneer.get_cmdclass(),
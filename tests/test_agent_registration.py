@@ -84,3 +84,154 @@ def test_malformed_agent_id(bad_id):
 
     with pytest.raises(ValueError, match=r"Attempted to register malformed agent ID"):
         registry.register(bad_id)
+
+
+def test_entry_point_loaded_once(mocker):
+    load = mocker.spy(agent_registration, "_load")
+    registry = agent_registration.AgentRegistry()
+    registry.register(
+        id="SomeAgent-v0",
+        entry_point="tests.test_agent_registration:FakeAgent",
+        kwargs={"param_1": "PARAM_1", "param_2": "PARAM_2"},
+    )
+
+    for _ in range(3):
+        registry.make(id="SomeAgent-v0", env="FAKE_ENVIRONMENT")
+
+    assert load.call_count == 1
+
+
+def test_resolve_entry_points():
+    registry = agent_registration.AgentRegistry()
+    registry.register("Agent-v0", entry_point="tests.test_agent_registration:FakeAgent")
+    registry.resolve_entry_points()
+
+    assert registry.agent_specs["Agent-v0"].factory is FakeAgent
+
+
+def test_resolve_entry_points_lists_failures():
+    registry = agent_registration.AgentRegistry()
+    registry.register("Good-v0", entry_point="tests.test_agent_registration:FakeAgent")
+    registry.register("MissingModule-v0", entry_point="tests.not_a_module:FakeAgent")
+    registry.register("MissingObject-v0", entry_point="tests.test_agent_registration:Missing")
+    registry.register("Deprecated-v0", entry_point=None)
+
+    with pytest.raises(ValueError, match=r"of 3 agents") as error:
+        registry.resolve_entry_points()
+
+    message = str(error.value)
+    for agent_id in ["MissingModule-v0", "MissingObject-v0", "Deprecated-v0"]:
+        assert agent_id in message
+    assert "Good-v0" not in message
+
+
+class GridAgent:
+    def __init__(self, env, alpha, beta=None, fixed=None):
+        self.params = (alpha, beta, fixed)
+
+
+def test_register_grid():
+    registry = agent_registration.AgentRegistry()
+    registry.register("SomeAgent-v0", entry_point=GridAgent, kwargs={"alpha": 0, "beta": 0})
+    grid = registry.register_grid(
+        "Grid",
+        "tests.test_agent_registration:GridAgent",
+        {"alpha": [0.1, 0.2, 0.3], "beta": ["a", "b"]},
+        version=1,
+        kwargs={"fixed": "FIXED"},
+    )
+
+    assert len(grid) == 6
+    assert [spec.id for spec in registry.all()] == [
+        "SomeAgent-v0",
+        "Grid:alpha:0.1:beta:a-v1",
+        "Grid:alpha:0.1:beta:b-v1",
+        "Grid:alpha:0.2:beta:a-v1",
+        "Grid:alpha:0.2:beta:b-v1",
+        "Grid:alpha:0.3:beta:a-v1",
+        "Grid:alpha:0.3:beta:b-v1",
+    ]
+    assert registry.make("Grid:alpha:0.2:beta:b-v1").params == (0.2, "b", "FIXED")
+    assert grid[3].id == "Grid:alpha:0.2:beta:b-v1"
+
+
+@pytest.mark.parametrize(
+    "missing_id",
+    ["Grid:alpha:0.4:beta:a-v0", "Grid:beta:a:alpha:0.1-v0", "Grid:alpha:0.1-v0", "Grid-v0"],
+)
+def test_make_missing_grid_agent(missing_id):
+    registry = agent_registration.AgentRegistry()
+    registry.register_grid("Grid", GridAgent, {"alpha": [0.1, 0.2], "beta": ["a"]})
+
+    with pytest.raises(KeyError, match=r"No registered agent with ID"):
+        registry.make(missing_id)
+
+
+def test_register_grid_duplicate_id():
+    registry = agent_registration.AgentRegistry()
+    registry.register("Grid:alpha:1-v0")
+    with pytest.raises(ValueError, match=r"Cannot re-register IDs"):
+        registry.register_grid("Grid", GridAgent, {"alpha": [1, 2]})
+
+    registry.register_grid("Grid", GridAgent, {"alpha": [2, 3]}, version=1)
+    with pytest.raises(ValueError, match=r"Cannot re-register ID"):
+        registry.register("Grid:alpha:3-v1")
+    with pytest.raises(ValueError, match=r"Cannot re-register grid"):
+        registry.register_grid("Grid", GridAgent, {"beta": [1]}, version=1)
+
+
+@pytest.mark.parametrize(
+    "param_grid", [{"alpha": ["a:b"]}, {"alpha": ["a/b"]}, {"al pha": [1]}, {"alpha": [1, "1"]}]
+)
+def test_register_grid_malformed_values(param_grid):
+    registry = agent_registration.AgentRegistry()
+
+    with pytest.raises(ValueError, match=r"Attempted to register grid|Repeated value"):
+        registry.register_grid("Grid", GridAgent, param_grid)
+
+
+def test_grid_specs_are_made_lazily(mocker):
+    registry = agent_registration.AgentRegistry()
+    grid = registry.register_grid(
+        "Grid", lambda env, **params: params, {f"p{i}": range(10) for i in range(5)}
+    )
+    spec_init = mocker.spy(agent_registration.AgentSpec, "__init__")
+
+    assert len(grid) == 100_000
+    assert registry.make("Grid:p0:1:p1:2:p2:3:p3:4:p4:5-v0") == dict(p0=1, p1=2, p2=3, p3=4, p4=5)
+    assert grid[12_345].id == "Grid:p0:1:p1:2:p2:3:p3:4:p4:5-v0"
+    assert spec_init.call_count == 2
+
+
+def test_grid_entry_point_loaded_once(mocker):
+    load = mocker.spy(agent_registration, "_load")
+    registry = agent_registration.AgentRegistry()
+    registry.register_grid(
+        "Grid", "tests.test_agent_registration:GridAgent", {"alpha": [1, 2], "beta": [3, 4]}
+    )
+    registry.resolve_entry_points()
+
+    for spec in registry.all():
+        spec.make(None)
+
+    assert load.call_count == 1
+
+
+@pytest.mark.parametrize("num_shards", [1, 3, 4])
+def test_shard(num_shards):
+    registry = agent_registration.AgentRegistry()
+    registry.register("SomeAgent-v0", entry_point=GridAgent, kwargs={"alpha": 0})
+    registry.register_grid("Grid", GridAgent, {"alpha": [1, 2, 3], "beta": [1, 2]})
+    registry.register_grid("Other", GridAgent, {"alpha": [1, 2, 3]})
+    all_ids = [spec.id for spec in registry.all()]
+
+    shards = [[spec.id for spec in registry.shard(i, num_shards).all()] for i in range(num_shards)]
+
+    assert sorted(sum(shards, [])) == sorted(all_ids)
+    # Shards are balanced
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+    # Agents are made from their shard
+    for shard_index, ids in enumerate(shards):
+        shard = registry.shard(shard_index, num_shards)
+        for agent_id in ids:
+            shard.make(agent_id)
@@ -0,0 +1,44 @@
+from truman.typing import BatchAgent
+
+import numpy as np
+import pytest
+
+from truman.batch_agent import BatchedAgent
+
+
+class CountingAgent:
+    def __init__(self, env, offset):
+        self.offset = offset
+        self.num_acts = 0
+
+    def act(self, previous_observation):
+        self.num_acts += 1
+        return previous_observation[0] + self.offset, {"num_acts": self.num_acts}
+
+
+def test_batched_agent():
+    agent = BatchedAgent([CountingAgent(None, 0), CountingAgent(None, 1)])
+    assert isinstance(agent, BatchAgent)
+
+    actions, info = agent.act_batch(np.array([[0, 0], [5, 0]]))
+    np.testing.assert_array_equal(actions, [0, 6])
+    np.testing.assert_array_equal(info["num_acts"], [1, 1])
+
+    actions, info = agent.act_batch(np.array([[1, 0], [1, 0]]))
+    np.testing.assert_array_equal(actions, [1, 2])
+    np.testing.assert_array_equal(info["num_acts"], [2, 2])
+
+
+def test_batched_agent_from_factory():
+    agent = BatchedAgent.from_factory(CountingAgent, num_replicas=3, offset=2)
+
+    actions, _ = agent.act_batch(np.zeros((3, 2), dtype=int))
+    np.testing.assert_array_equal(actions, [2, 2, 2])
+    assert len({id(replica_agent) for replica_agent in agent.agents}) == 3
+
+
+def test_batched_agent_wrong_number_of_replicas():
+    agent = BatchedAgent.from_factory(CountingAgent, num_replicas=3, offset=0)
+
+    with pytest.raises(ValueError, match=r"observations of 2 replicas, but have agents of 3"):
+        agent.act_batch(np.zeros((2, 2)))
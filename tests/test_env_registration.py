@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+import pytest
+from gym import error
+
+import truman
+from truman import env_registration, manifest
+
+
+registry = env_registration.LazyEnvRegistry(path="tests.test_env_registration:registry")
+registry.declare("tests.test_env_registration", ["Registered-v0", "Unregistered-v0"])
+registry.register("Registered-v0", entry_point="truman.time_period_step:DiscreteStrategyBinomial")
+
+
+def test_declared_specs_resolve():
+    assert {spec.id for spec in registry.all()} == {"Registered-v0", "Unregistered-v0"}
+
+    spec = env_registration.LazyEnvSpec(
+        "Registered-v0", "tests.test_env_registration", "tests.test_env_registration:registry"
+    )
+    assert spec.resolve() is registry.env_specs["Registered-v0"]
+
+
+def test_declared_spec_not_registered_raises():
+    with pytest.raises(error.Error, match=r"did not register declared env Unregistered-v0"):
+        registry.spec("Unregistered-v0").make()
+
+
+def test_declare_duplicate_id_raises():
+    with pytest.raises(error.Error, match=r"Cannot re-register id: Registered-v0"):
+        registry.declare("tests.test_env_registration", ["Registered-v0"])
+
+
+def test_env_modules_imported_when_made():
+    code = (
+        "import sys, truman; "
+        "specs = list(truman.registry.all()); "
+        "assert 'truman.time_period_step' not in sys.modules; "
+        "specs[0].make(); "
+        "assert 'truman.time_period_step' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.parametrize("module, ids", manifest.ENV_IDS.items())
+def test_manifest_matches_registrations(module, ids):
+    """Each env module registers exactly the envs declared for it in the manifest."""
+    for id in ids:
+        truman.registry.env_specs[id].make()
+
+    registered = {
+        spec.id
+        for spec in truman.registry.all()
+        if spec.entry_point is not None and spec.entry_point.startswith(f"{module}:")
+    }
+    assert registered == set(ids)
@@ -1,3 +1,7 @@
+import gym
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
 import pytest
 
 from truman import history
@@ -41,3 +45,120 @@ def test_to_df(hist):
     assert (df["action"].iloc[:1].isnull()).all()
     assert (df["action"].iloc[1:] == [0, 1]).all()
     assert (df["observation_0"] == [10, 10, 10]).all()
+
+
+@pytest.fixture
+def columnar_hist():
+    hist = history.ColumnarHistory(
+        observation_space=gym.spaces.Box(low=0, high=10, shape=(2,), dtype=int),
+        action_space=gym.spaces.Discrete(2),
+        capacity=2,
+    )
+    hist.append(None, (10, 5), None, None, None, None)
+    hist.append(0, (10, 5), 5, False, {"info_1": 1, "info_2": 2}, {"agent_foo": 0})
+    hist.append(1, (10, 4), 4, True, {"info_1": 0, "info_2": 0}, {"agent_foo": 1})
+    return hist
+
+
+def test_columnar_to_df(columnar_hist, hist):
+    df = columnar_hist.to_df()
+    assert df.columns.to_list() == hist.to_df().columns.to_list()
+    assert df["action"].isnull().to_list() == [True, False, False]
+    assert df["action"].iloc[1:].to_list() == [0, 1]
+    assert df["observation_1"].to_list() == [5, 5, 4]
+    assert df["reward"].iloc[1:].to_list() == [5.0, 4.0]
+    assert df["done"].isnull().to_list() == [True, False, False]
+    assert df["done"].iloc[1:].to_list() == [False, True]
+    assert df["info_1"].iloc[1:].to_list() == [1.0, 0.0]
+    assert df["agent_agent_foo"].isnull().to_list() == [True, False, False]
+
+
+def test_columnar_grows(columnar_hist):
+    for i in range(10):
+        columnar_hist.append(0, (i, i), 1, False, {"info_1": 1, "info_2": 2}, {"agent_foo": 0})
+
+    df = columnar_hist.to_df()
+    assert len(df) == 13
+    assert df["observation_0"].iloc[3:].to_list() == list(range(10))
+    assert len(columnar_hist.all()[4]["info_1"]) == 13
+
+
+def test_columnar_grows_missing_infos(columnar_hist):
+    for i in range(10):
+        columnar_hist.append(0, (i, i), 1, False, {"info_1": 1}, {"bar": "a"})
+    # Missing only after the history has grown past its initial capacity
+    columnar_hist.append(0, (0, 0), 1, False, {"info_2": 2}, {})
+
+    df = columnar_hist.to_df()
+    assert np.isnan(df["info_1"].iloc[-1])
+    assert df["info_2"].iloc[3:-1].isnull().all()
+    assert df["agent_bar"].isnull().to_list() == [True] * 3 + [False] * 10 + [True]
+
+
+def test_streaming_history(tmpdir, hist):
+    path = str(tmpdir / "history.parquet")
+    streaming_hist = history.StreamingHistory(path, row_group_size=2)
+    for events in zip(*hist.all()):
+        streaming_hist.append(*events)
+    streaming_hist.append(0, (10, 5), 5, False, {"info_1": 1, "info_2": 2}, {"agent_foo": 0})
+    # Only the events since the last row group was written are held
+    assert len(streaming_hist.actions) == 0
+
+    df = streaming_hist.to_df()
+    assert df["reward"].iloc[1:].to_list() == [5.0, 5.0, 5.0]
+    assert df["action"].iloc[1:].to_list() == [0, 1, 0]
+
+    written = pd.read_parquet(path)
+    assert pq.ParquetFile(path).num_row_groups == 2
+    assert written.columns.to_list() == hist.to_df().columns.to_list()
+    assert written["action"].iloc[1:].to_list() == [0, 1, 0]
+    assert written["info_1"].iloc[1:].to_list() == [1, 0, 1]
+    assert written["done"].iloc[1:].to_list() == [False, True, False]
+
+
+def test_streaming_history_abort(tmpdir, hist):
+    path = tmpdir / "history.parquet"
+    streaming_hist = history.StreamingHistory(str(path), row_group_size=2)
+    for events in zip(*hist.all()):
+        streaming_hist.append(*events)
+    assert path.exists()
+
+    streaming_hist.abort()
+    assert not path.exists()
+
+
+def test_streaming_history_raises_row_group_too_small(tmpdir):
+    with pytest.raises(ValueError, match=r"row_group_size must be at least 2"):
+        history.StreamingHistory(str(tmpdir / "history.parquet"), row_group_size=1)
+
+
+def test_batch_history():
+    batch_hist = history.BatchHistory()
+    batch_hist.append(None, np.zeros((2, 2), dtype=int), None, None, None, None)
+    batch_hist.append(
+        np.array([0, 1]),
+        np.array([[10, 5], [10, 6]]),
+        np.array([5.0, 6.0]),
+        np.array([False, False]),
+        {"prb": np.array([0.1, 0.2]), "shared": "info"},
+        {"foo": np.array([1, 2])},
+    )
+    batch_hist.append(
+        np.array([1, 1]),
+        np.array([[10, 7], [10, 8]]),
+        np.array([7.0, 8.0]),
+        np.array([True, True]),
+        {"prb": np.array([0.3, 0.4]), "shared": "info"},
+        {"foo": np.array([3, 4])},
+    )
+
+    df = batch_hist.to_df()
+    assert df["replica"].to_list() == [0, 0, 0, 1, 1, 1]
+    assert df["action"].to_list() == [pd.NA, 0, 1, pd.NA, 1, 1]
+    assert df["observation_1"].to_list() == [0, 5, 7, 0, 6, 8]
+    np.testing.assert_array_equal(df["reward"], [np.nan, 5, 7, np.nan, 6, 8])
+    assert df["done"].to_list() == [pd.NA, False, True, pd.NA, False, True]
+    np.testing.assert_array_equal(df["prb"], [np.nan, 0.1, 0.3, np.nan, 0.2, 0.4])
+    assert df["shared"].isna().to_list() == [True, False, False, True, False, False]
+    assert df["shared"].dropna().to_list() == ["info"] * 4
+    assert df["agent_foo"].to_list() == [pd.NA, 1, 3, pd.NA, 2, 4]
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+import pytest
+
+import truman
+
+
+def test_import_is_lazy():
+    """Importing truman doesn't import any heavy dependencies, which are imported when needed."""
+    heavy_modules = ["gym", "matplotlib", "numpy", "pandas", "pyarrow", "scipy"]
+    code = f"import sys, truman; print([m for m in {heavy_modules} if m in sys.modules])"
+
+    imported = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout.strip()
+
+    assert imported == "[]"
+
+
+def test_lazy_attributes():
+    assert len(truman.registry.all()) > 0
+    assert truman.history.History
+    assert callable(truman.run)
+
+    with pytest.raises(AttributeError, match=r"has no attribute 'not_an_attribute'"):
+        truman.not_an_attribute
@@ -0,0 +1,53 @@
+import gym
+import numpy as np
+import pandas as pd
+import pytest
+
+from truman import oracle, time_period_step
+
+
+def switching_behaviour(strat, timestep):
+    # Strategy 0 is best in the first two timesteps, strategy 1 after
+    if timestep < 2:
+        return [(0.5, 0.4), (0.5, 0.2)][strat]
+    return [(0.5, 0.1), (0.2, 0.5)][strat]
+
+
+@pytest.fixture(params=[False, True], ids=["behaviour_func", "precomputed"])
+def env(request):
+    return time_period_step.DiscreteStrategyBinomial(
+        cohort_size=100,
+        episode_length=4,
+        strategy_keys=["a", "b"],
+        behaviour_func=switching_behaviour,
+        precompute_behaviour=request.param,
+    )
+
+
+def test_expected_rewards(env):
+    np.testing.assert_allclose(
+        oracle.expected_rewards(env), [[20, 10], [20, 10], [5, 10], [5, 10]]
+    )
+    np.testing.assert_array_equal(oracle.optimal_strategies(env), [0, 0, 1, 1])
+
+
+def test_expected_regret(env):
+    np.testing.assert_allclose(oracle.expected_regret(env, [0, 1, 0, 1]), [0, 10, 5, 0])
+    # Regret of a partial episode
+    np.testing.assert_allclose(oracle.expected_regret(env, [1, 1]), [10, 10])
+
+
+def test_add_regret(env):
+    history = pd.DataFrame({"action": [None, 0, 1, 0, 1], "reward": [np.nan, 1, 2, 3, 4]})
+    oracle.add_regret(history, env)
+
+    np.testing.assert_allclose(history["expected_regret"], [np.nan, 0, 10, 5, 0])
+    np.testing.assert_allclose(history["cumulative_expected_regret"], [np.nan, 0, 10, 15, 15])
+
+
+def test_no_oracle():
+    class OtherEnv(gym.Env):
+        pass
+
+    with pytest.raises(ValueError, match=r"No oracle of env"):
+        oracle.expected_rewards(OtherEnv())
@@ -1,7 +1,15 @@
+import functools
+import subprocess
+import sys
 from unittest import mock
 
+import numpy as np
+import pandas as pd
 import pytest
+from gym.envs.registration import EnvRegistry
 
+from truman import agent_registration, errors, manifest, time_period_step
+from truman.agent_registration import AgentRegistry
 from truman.run import interface
 
 
@@ -22,6 +30,9 @@ class FakeRegistry:
             envs.append(env)
         return envs
 
+    def resolve_entry_points(self):
+        pass
+
 
 def test_run(mocker):
     patched_store = mocker.patch.object(interface, "store")
@@ -42,9 +53,331 @@ def test_run(mocker):
     assert "max_iters" in filled_params
 
 
+@pytest.mark.parametrize("resolve_entry_points", [False, True])
+def test_run_resolve_entry_points(mocker, resolve_entry_points):
+    mocker.patch.object(interface, "store")
+    patched_simulation = mocker.patch.object(interface, "simulation")
+    patched_simulation.run.return_value = (None, None)
+    agent_suite = FakeRegistry(["agent_1"])
+    mocker.spy(agent_suite, "resolve_entry_points")
+
+    run_params = {"output_directory": "test", "resolve_entry_points": resolve_entry_points}
+    interface.run(agent_suite, [FakeRegistry(["env_1"])], run_params)
+
+    assert agent_suite.resolve_entry_points.call_count == int(resolve_entry_points)
+
+
+def test_run_background_writes(mocker):
+    patched_store = mocker.patch.object(interface, "store")
+    patched_simulation = mocker.patch.object(interface, "simulation")
+    patched_simulation.run.return_value = (None, None)
+
+    env_suites = [FakeRegistry(["env_1", "env_2"])]
+    agent_suite = FakeRegistry(["agent_1", "agent_2"])
+
+    interface.run(
+        agent_suite, env_suites, run_params={"output_directory": "test", "write_queue_size": 2}
+    )
+
+    patched_store.BackgroundWriter.assert_called_once_with(2)
+    writer = patched_store.BackgroundWriter.return_value.__enter__.return_value
+    assert writer.write.call_count == 4
+    assert patched_store.write.call_count == 0
+
+
+def test_run_resume(mocker):
+    patched_store = mocker.patch.object(interface, "store")
+    patched_store.is_complete.side_effect = lambda agent_id, env_id, _: env_id == "env_1"
+    patched_simulation = mocker.patch.object(interface, "simulation")
+    patched_simulation.run.return_value = (None, None)
+
+    env_suites = [FakeRegistry(["env_1", "env_2"])]
+    agent_suite = FakeRegistry(["agent_1", "agent_2"])
+
+    interface.run(agent_suite, env_suites, run_params={"output_directory": "test", "resume": True})
+
+    assert patched_store.is_complete.call_count == 4
+    assert patched_store.write.call_count == 2
+    assert {call[0][3] for call in patched_store.write.call_args_list} == {"env_2"}
+
+
 def test_run_clashing_ids():
     env_suites = [FakeRegistry(["env_1"]), FakeRegistry(["env_1", "env_2"])]
     agent_suite = FakeRegistry(["agent_1", "agent_2"])
 
     with pytest.raises(AssertionError, match=r"Repeated environment ID"):
         interface.run(agent_suite, env_suites, run_params={"output_directory": "test"})
+
+
+class FirstStrategyAgent:
+    def __init__(self, env):
+        pass
+
+    def act(self, _):
+        return 0, {}
+
+
+class FailingAgent(FirstStrategyAgent):
+    def act(self, _):
+        raise RuntimeError("Agent failed")
+
+
+class LateFailingAgent(FirstStrategyAgent):
+    def __init__(self, env):
+        self.num_steps = 0
+
+    def act(self, _):
+        self.num_steps += 1
+        if self.num_steps == 4:
+            raise RuntimeError("Agent failed")
+        return 0, {}
+
+
+def _short_env_suite(ids):
+    env_suite = EnvRegistry()
+    for id_ in ids:
+        env_suite.register(
+            id=id_,
+            entry_point="truman.time_period_step:DiscreteStrategyBinomial",
+            kwargs={
+                "cohort_size": 100,
+                "episode_length": 5,
+                "strategy_keys": ["a", "b"],
+                "behaviour_func": functools.partial(
+                    time_period_step.static_interaction,
+                    behaviour_params={0: (0.5, 0.2), 1: (0.5, 0.3)},
+                ),
+            },
+        )
+    return env_suite
+
+
+class SampleAgent:
+    def __init__(self, env):
+        self.action_space = env.action_space
+
+    def act(self, _):
+        return self.action_space.sample(), {}
+
+
+def test_run_lazy_registry(tmpdir):
+    # In a new process, so the env modules are imported, and their envs registered, by the run
+    code = (
+        "import sys, truman; "
+        "from truman.agent_registration import AgentRegistry; "
+        "agents = AgentRegistry(); "
+        "agents.register('Sample-v0', entry_point='tests.test_run.test_interface:SampleAgent'); "
+        f"truman.run(agents, [truman.registry], {{'output_directory': {str(tmpdir)!r}}}); "
+        "assert 'truman.time_period_step' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    num_envs = sum(len(ids) for ids in manifest.ENV_IDS.values())
+    assert len(tmpdir.listdir(lambda path: path.basename.endswith("__summary.csv"))) == num_envs
+
+
+def test_run_parallel(tmpdir):
+    env_suites = [_short_env_suite(["Env_1-v0", "Env_2-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Agent_1-v0", entry_point=FirstStrategyAgent)
+    agent_suite.register("Agent_2-v0", entry_point=FirstStrategyAgent)
+
+    interface.run(
+        agent_suite, env_suites, run_params={"output_directory": str(tmpdir), "workers": 2}
+    )
+
+    for agent_id in ["Agent_1-v0", "Agent_2-v0"]:
+        for env_id in ["Env_1-v0", "Env_2-v0"]:
+            assert (tmpdir / f"agent_id={agent_id}__env_id={env_id}__summary.csv").exists()
+
+
+class StrategyAgent(FirstStrategyAgent):
+    def __init__(self, env, strategy, replica):
+        self.strategy = strategy
+
+    def act(self, _):
+        return self.strategy, {}
+
+
+def test_run_parallel_agent_grid(tmpdir):
+    env_suites = [_short_env_suite(["Env_1-v0"])]
+    agent_suite = AgentRegistry()
+    # More agents than are submitted to the single worker at once
+    agent_suite.register_grid("Grid", StrategyAgent, {"strategy": [0, 1], "replica": ["a", "b"]})
+
+    interface.run(
+        agent_suite, env_suites, run_params={"output_directory": str(tmpdir), "workers": 1}
+    )
+
+    for spec in agent_suite.all():
+        assert (tmpdir / f"agent_id={spec.id}__env_id=Env_1-v0__summary.csv").exists()
+
+
+def test_run_agent_grid_entry_points_loaded_once(tmpdir, mocker):
+    load = mocker.spy(agent_registration, "_load")
+    env_suites = [_short_env_suite(["Env_1-v0", "Env_2-v0", "Env_3-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Agent-v0", "tests.test_run.test_interface:FirstStrategyAgent")
+    agent_suite.register_grid(
+        "Grid",
+        "tests.test_run.test_interface:StrategyAgent",
+        {"strategy": [0, 1], "replica": ["a", "b"]},
+    )
+
+    interface.run(agent_suite, env_suites, run_params={"output_directory": str(tmpdir)})
+
+    assert len(tmpdir.listdir(lambda path: path.basename.endswith("__summary.csv"))) == 15
+    # Once for the agent and once for the grid, however many of the grid's specs are made
+    assert load.call_count == 2
+
+
+def test_run_parallel_failure_does_not_stop_other_pairs(tmpdir):
+    env_suites = [_short_env_suite(["Env_1-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Failing-v0", entry_point=FailingAgent)
+    agent_suite.register("Working-v0", entry_point=FirstStrategyAgent)
+
+    with pytest.raises(errors.RunFailed, match=r"1 of 2 runs failed.*Failing-v0"):
+        interface.run(
+            agent_suite, env_suites, run_params={"output_directory": str(tmpdir), "workers": 2}
+        )
+
+    assert (tmpdir / "agent_id=Working-v0__env_id=Env_1-v0__summary.csv").exists()
+    assert not (tmpdir / "agent_id=Failing-v0__env_id=Env_1-v0__summary.csv").exists()
+
+
+def test_run_failure_removes_stream(tmpdir):
+    env_suites = [_short_env_suite(["Env_1-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Failing-v0", entry_point=LateFailingAgent)
+
+    with pytest.raises(RuntimeError, match=r"Agent failed"):
+        interface.run(
+            agent_suite,
+            env_suites,
+            run_params={"output_directory": str(tmpdir), "stream_row_group_size": 2},
+        )
+
+    # The row groups streamed before the failure are removed with their temporary file
+    assert tmpdir.listdir() == []
+
+
+@pytest.mark.parametrize(
+    "param, value",
+    [
+        ("timing", "sumary"),
+        ("history_backend", "columns"),
+        ("output_format", "datasets"),
+    ],
+)
+def test_run_invalid_option(param, value):
+    with pytest.raises(ValueError, match=rf"{param} must be one of .*, not '{value}'"):
+        interface.run(None, None, run_params={"output_directory": "test", param: value})
+
+
+def test_run_invalid_streamed_timing():
+    run_params = {"output_directory": "test", "stream_row_group_size": 2, "timing": "history"}
+    with pytest.raises(ValueError, match=r"timing of each step in the history isn't supported"):
+        interface.run(None, None, run_params=run_params)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_run_replicates(tmpdir, workers):
+    env_suites = [_short_env_suite(["Env_1-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Agent-v0", entry_point=FirstStrategyAgent)
+    run_params = {
+        "output_directory": str(tmpdir),
+        "num_replicates": 3,
+        "seed": 1,
+        "workers": workers,
+    }
+
+    interface.run(agent_suite, env_suites, run_params)
+
+    base_fp = "agent_id=Agent-v0__env_id=Env_1-v0"
+    histories = [pd.read_parquet(tmpdir / f"{base_fp}__replicate={i}.parquet") for i in range(3)]
+    summary = pd.read_csv(tmpdir / f"{base_fp}__summary.csv").iloc[0]
+    assert summary["num_replicates"] == 3
+    assert summary["avg_reward"] == pytest.approx(
+        np.mean([history["reward"].mean() for history in histories])
+    )
+    assert summary["avg_reward_ci_low"] < summary["avg_reward"] < summary["avg_reward_ci_high"]
+    # Replicates are seeded differently
+    assert not histories[0]["reward"].equals(histories[1]["reward"])
+
+
+def test_run_replicates_reproducible(tmpdir):
+    env_suites = [_short_env_suite(["Env_1-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Agent-v0", entry_point=FirstStrategyAgent)
+
+    rewards = []
+    for num_replicates in [2, 3]:
+        output_directory = tmpdir / str(num_replicates)
+        output_directory.mkdir()
+        run_params = {
+            "output_directory": str(output_directory),
+            "num_replicates": num_replicates,
+            "seed": 1,
+        }
+        interface.run(agent_suite, env_suites, run_params)
+        history = pd.read_parquet(
+            output_directory / "agent_id=Agent-v0__env_id=Env_1-v0__replicate=1.parquet"
+        )
+        rewards.append(history["reward"])
+
+    # A replicate's seed doesn't depend on the number of replicates
+    pd.testing.assert_series_equal(*rewards)
+
+
+def test_run_invalid_num_replicates():
+    with pytest.raises(ValueError, match=r"num_replicates must be at least 1"):
+        interface.run(None, None, run_params={"output_directory": "test", "num_replicates": 0})
+
+
+def test_run_common_random_numbers(tmpdir):
+    env_suites = [_short_env_suite(["Env_1-v0"])]
+    agent_suite = AgentRegistry()
+    agent_suite.register("Agent_1-v0", entry_point=FirstStrategyAgent)
+    agent_suite.register("Agent_2-v0", entry_point=FirstStrategyAgent)
+
+    interface.run(
+        agent_suite,
+        env_suites,
+        run_params={"output_directory": str(tmpdir), "common_random_numbers": True},
+    )
+
+    histories = [
+        pd.read_parquet(tmpdir / f"agent_id={agent_id}__env_id=Env_1-v0.parquet")
+        for agent_id in ["Agent_1-v0", "Agent_2-v0"]
+    ]
+    pd.testing.assert_frame_equal(*histories)
+
+
+def test_run_successive_halving(tmpdir):
+    env_suites = [_short_env_suite([f"Env_{i}-v0" for i in range(4)])]
+    agent_suite = AgentRegistry()
+    agent_suite.register_grid("Grid", StrategyAgent, {"strategy": [0, 1], "replica": ["a"]})
+    run_params = {"output_directory": str(tmpdir), "scheduler": "successive_halving", "seed": 1}
+
+    interface.run(agent_suite, env_suites, run_params)
+
+    # The first strategy converts less, so is pruned after the first env
+    worse, better = [spec.id for spec in agent_suite.all()]
+    schedule = pd.read_csv(tmpdir / "schedule.csv").set_index("agent_id")
+    assert schedule["num_envs"].to_dict() == {worse: 1, better: 4}
+    assert not (tmpdir / f"agent_id={worse}__env_id=Env_1-v0__summary.csv").exists()
+    assert (tmpdir / f"agent_id={better}__env_id=Env_3-v0__summary.csv").exists()
+
+
+@pytest.mark.parametrize(
+    "params, match",
+    [
+        ({"scheduler": "unknown"}, r"scheduler must be one of"),
+        ({"halving_rate": 1}, r"halving_rate"),
+    ],
+)
+def test_run_invalid_scheduler(params, match):
+    with pytest.raises(ValueError, match=match):
+        interface.run(None, None, run_params={"output_directory": "test", **params})
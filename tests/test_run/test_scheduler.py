@@ -0,0 +1,73 @@
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from truman.run import scheduler, store
+
+
+class FakeRegistry:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def all(self):
+        specs = []
+        for id_ in self.ids:
+            spec = mock.Mock()
+            spec.id = id_
+            specs.append(spec)
+        return specs
+
+
+@pytest.mark.parametrize(
+    "num_agents, num_envs, halving_rate, expected",
+    [
+        (8, 20, 2, [2, 3, 5, 10]),
+        (8, 3, 2, [1, 1, 1]),
+        (1, 5, 2, [5]),
+        (3, 10, 3, [3, 7]),
+        (8, 0, 2, []),
+    ],
+)
+def test_round_sizes(num_agents, num_envs, halving_rate, expected):
+    assert scheduler.round_sizes(num_agents, num_envs, halving_rate) == expected
+
+
+def test_scores():
+    scores = scheduler._scores({"a": 1.0, "b": 2.0, "c": 2.0})
+
+    assert scores == {"a": 0.0, "b": 0.75, "c": 0.75}
+    assert scheduler._scores({"a": 1.0}) == {"a": 1.0}
+
+
+@pytest.mark.parametrize("output_format", ["files", "dataset"])
+def test_successive_halving(tmpdir, output_format):
+    run_params = {"output_directory": str(tmpdir), "output_format": output_format}
+    agent_suite = FakeRegistry([f"Agent_{i}-v0" for i in range(4)])
+    env_suites = [FakeRegistry(["Env_1-v0", "Env_2-v0"]), FakeRegistry(["Env_3-v0"])]
+    rounds = []
+
+    def run_pairs(pairs, run_params):
+        pairs = list(pairs)
+        rounds.append(sorted({(agent_spec.id, env_spec.id) for agent_spec, env_spec in pairs}))
+        for agent_spec, env_spec in pairs:
+            # Higher numbered agents are better, except Agent_3, which is the worst
+            avg_reward = -1 if agent_spec.id == "Agent_3-v0" else int(agent_spec.id[6])
+            summary = {"avg_reward": avg_reward}
+            store.write_summary(summary, agent_spec.id, env_spec.id, run_params)
+
+    schedule = scheduler.successive_halving(agent_suite, env_suites, run_params, run_pairs)
+
+    assert [len(round_pairs) for round_pairs in rounds] == [4, 2, 1]
+    assert rounds[1] == [("Agent_1-v0", "Env_2-v0"), ("Agent_2-v0", "Env_2-v0")]
+    assert rounds[2] == [("Agent_2-v0", "Env_3-v0")]
+    schedule_df = pd.DataFrame(schedule).set_index("agent_id")
+    assert schedule_df["num_envs"].to_list() == [1, 2, 3, 1]
+    assert schedule_df["pruned_after_round"].to_list()[:2] == [0, 1]
+    assert schedule_df.loc["Agent_2-v0", "score"] == 1.0
+
+    if output_format == "files":
+        written = pd.read_csv(tmpdir / "schedule.csv")
+    else:
+        written = pd.read_parquet(tmpdir / "schedule.parquet")
+    assert written["agent_id"].to_list() == list(schedule_df.index)
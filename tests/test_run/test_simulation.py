@@ -1,6 +1,11 @@
+import gym
 import numpy as np
+import pandas as pd
 import pytest
 
+import truman
+from truman import time_period_step
+from truman.batch_agent import BatchedAgent
 from truman.errors import StoppedEarly
 from truman.run import simulation
 
@@ -23,6 +28,11 @@ class FakeAgent:
         return 1, {}
 
 
+class FirstStrategyAgent:
+    def act(self, _):
+        return 0, {}
+
+
 @pytest.mark.parametrize("num_steps", [5, 2])
 def test_run(num_steps, mocker):
     mocker.patch.object(simulation.time, "time", side_effect=[1, 3])
@@ -42,3 +52,135 @@ def test_run_raises_hits_max_iters():
 
     with pytest.raises(StoppedEarly):
         simulation.run(agent=agent, env=env, run_params={"max_iters": 9})
+
+
+def test_run_columnar_history(mocker):
+    mocker.patch.object(simulation.time, "time", side_effect=[1, 3])
+    env = FakeEnv(5)
+    env.observation_space = gym.spaces.Box(low=0, high=1, shape=(1,), dtype=int)
+    env.action_space = gym.spaces.Discrete(2)
+
+    history, _ = simulation.run(
+        agent=FakeAgent(), env=env, run_params={"max_iters": 100, "history_backend": "columnar"}
+    )
+
+    assert len(history) == 6
+    assert history["reward"].sum() == 5
+
+
+def test_run_timing():
+    history, _ = simulation.run(
+        agent=FakeAgent(), env=FakeEnv(3), run_params={"max_iters": 100, "timing": "summary"}
+    )
+
+    assert history["agent_seconds"].isnull().to_list() == [True, False, False, False]
+    assert (history["env_seconds"].iloc[1:] >= 0).all()
+
+
+def test_run_regret():
+    env = time_period_step.DiscreteStrategyBinomial(
+        cohort_size=100,
+        episode_length=3,
+        strategy_keys=["a", "b"],
+        behaviour_func=lambda strat, timestep: [(0.5, 0.2), (0.5, 0.4)][strat],
+    )
+
+    history, _ = simulation.run(
+        agent=FakeAgent(), env=env, run_params={"max_iters": 100, "regret": True}
+    )
+
+    assert history["expected_regret"].iloc[1:].to_list() == [0, 0, 0]
+    assert history["cumulative_expected_regret"].iloc[-1] == 0
+
+    history, _ = simulation.run(
+        agent=FirstStrategyAgent(), env=env, run_params={"max_iters": 100, "regret": True}
+    )
+
+    np.testing.assert_allclose(history["cumulative_expected_regret"].iloc[1:], [10, 20, 30])
+
+
+class FirstStrategyBatchAgent:
+    def act_batch(self, _):
+        return np.zeros(4, dtype=int), {}
+
+
+@pytest.mark.parametrize(
+    "agent",
+    [
+        FirstStrategyBatchAgent(),
+        BatchedAgent.from_factory(lambda env: FirstStrategyAgent(), num_replicas=4),
+    ],
+)
+def test_run_batch(agent):
+    env = time_period_step.DiscreteStrategyBinomialBatch(
+        num_replicas=4,
+        cohort_size=100,
+        episode_length=3,
+        strategy_keys=["a", "b"],
+        behaviour_func=lambda strat, timestep: [(0.5, 0.2), (0.5, 0.4)][strat],
+    )
+
+    history, _ = simulation.run(agent=agent, env=env, run_params={"max_iters": 100})
+
+    assert len(history) == 4 * (3 + 1)
+    assert history.groupby("replica")["done"].last().all()
+    assert (history["action"].dropna() == 0).all()
+
+
+def test_run_batch_unsupported_params():
+    with pytest.raises(ValueError, match=r"timing isn't supported by batch runs"):
+        simulation.run(
+            FirstStrategyBatchAgent(), env=None, run_params={"max_iters": 1, "timing": "summary"}
+        )
+    with pytest.raises(ValueError, match=r"not a given history"):
+        simulation.run(FirstStrategyBatchAgent(), env=None, run_params={}, history=[])
+
+
+ENV_ID = "TimePeriodStep:Static:conv_1:0.2:conv_2:0.3-v0"
+
+
+def _checkpoint(agent, num_steps):
+    """Make the registered env, and run the agent on it for num_steps."""
+    env = truman.registry.env_specs[ENV_ID].make()
+    observation = env.reset(seed=2021)
+    for _ in range(num_steps):
+        observation, _, _, _ = env.step(agent.act(observation)[0])
+    return env, observation
+
+
+def test_run_branches():
+    agent = FirstStrategyAgent()
+    env, observation = _checkpoint(agent, 100)
+    run_params = {"max_iters": 1000}
+
+    branches = simulation.run_branches(agent, env, run_params, observation, [0, 1])
+
+    assert len(branches) == 2
+    for (history, _), action in zip(branches, [0, 1]):
+        assert len(history) == 365 - 100 + 1
+        assert history["action"].iloc[1] == action
+        assert history["done"].iloc[-1]
+    # The env is restored to the branches' start
+    assert env.timestep == 100
+    # The branch of the agent's own action is the episode's actual continuation
+    env, observation = _checkpoint(agent, 100)
+    rewards = [env.step(agent.act(observation)[0])[1] for _ in range(365 - 100)]
+    np.testing.assert_array_equal(branches[0][0]["reward"].iloc[1:], rewards)
+
+
+def test_run_branches_parallel():
+    agent = FirstStrategyAgent()
+    env, observation = _checkpoint(agent, 300)
+
+    serial = simulation.run_branches(agent, env, {"max_iters": 1000}, observation, [0, 1])
+    parallel = simulation.run_branches(
+        agent, env, {"max_iters": 1000, "workers": 2}, observation, [0, 1]
+    )
+
+    for (serial_history, _), (parallel_history, _) in zip(serial, parallel):
+        pd.testing.assert_frame_equal(serial_history, parallel_history)
+
+
+def test_run_branches_unsupported_params():
+    with pytest.raises(ValueError, match=r"regret isn't supported by branch runs"):
+        simulation.run_branches(FakeAgent(), None, {"max_iters": 1, "regret": True}, None, [0])
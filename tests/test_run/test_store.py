@@ -1,5 +1,11 @@
+import threading
+
+import numpy as np
 import pandas as pd
+import pyarrow.dataset as ds
+import pytest
 
+from truman import errors
 from truman.run import store
 
 
@@ -16,6 +22,32 @@ def test_summarise():
     assert summary["agent_id"] == "test_agent"
 
 
+def test_summarise_timing():
+    history = pd.DataFrame(
+        {
+            "reward": [np.nan, 1, 1, 1],
+            "agent_seconds": [np.nan, 1, 2, 3],
+            "env_seconds": [np.nan, 0.5, 0.5, 0.5],
+        }
+    )
+    summary = store.summarise(history, 10, "test_agent", "test_env", run_params=None)
+
+    assert summary["agent_time_seconds"] == 6
+    assert summary["env_time_seconds"] == 1.5
+    assert summary["agent_step_seconds_p50"] == 2
+    assert summary["env_step_seconds_p99"] == 0.5
+
+
+@pytest.mark.parametrize("timing, expected_columns", [("summary", 1), ("history", 3)])
+def test_write_timing(tmpdir, timing, expected_columns):
+    run_params = {"output_directory": str(tmpdir), "timing": timing}
+    history = pd.DataFrame({"reward": [1], "agent_seconds": [1], "env_seconds": [1]})
+    store.write(history, {"something": 1}, "agent", "env", run_params)
+
+    written = pd.read_parquet(tmpdir / "agent_id=agent__env_id=env.parquet")
+    assert len(written.columns) == expected_columns
+
+
 def test_write(tmpdir):
     run_params = {"output_directory": str(tmpdir)}
     history = pd.DataFrame({"a": [1, 2, 3]})
@@ -30,3 +62,270 @@ def test_write(tmpdir):
     read_summary = pd.read_csv(tmpdir / "agent_id=test_agent__env_id=test_env__summary.csv")
     assert len(read_summary) == 1
     assert read_summary["something"].iloc[0] == 1
+
+
+def test_write_leaves_no_temporary_files(tmpdir):
+    run_params = {"output_directory": str(tmpdir)}
+    store.write(pd.DataFrame({"a": [1, 2, 3]}), {"something": 1}, "agent", "env", run_params)
+
+    assert sorted(p.basename for p in tmpdir.listdir()) == [
+        "agent_id=agent__env_id=env.parquet",
+        "agent_id=agent__env_id=env__summary.csv",
+    ]
+
+
+def test_is_complete(tmpdir):
+    run_params = {"output_directory": str(tmpdir)}
+    assert not store.is_complete("agent", "env", run_params)
+
+    store.write(pd.DataFrame({"a": [1, 2, 3]}), {"something": 1}, "agent", "env", run_params)
+    assert store.is_complete("agent", "env", run_params)
+
+    # A truncated history is not mistaken for a complete one
+    history_fp = tmpdir / "agent_id=agent__env_id=env.parquet"
+    history_fp.write_binary(history_fp.read_binary()[:10])
+    assert not store.is_complete("agent", "env", run_params)
+
+
+def test_is_complete_missing_summary(tmpdir):
+    run_params = {"output_directory": str(tmpdir)}
+    store.write(pd.DataFrame({"a": [1, 2, 3]}), {"something": 1}, "agent", "env", run_params)
+    (tmpdir / "agent_id=agent__env_id=env__summary.csv").remove()
+
+    assert not store.is_complete("agent", "env", run_params)
+
+
+def test_write_streamed_history(tmpdir):
+    run_params = {"output_directory": str(tmpdir), "stream_row_group_size": 2}
+    stream = store.open_history("agent", "env", run_params)
+    stream.append(None, (1, 1), None, None, None, None)
+    stream.append(0, (1, 1), 1.0, True, {}, {})
+    history = stream.to_df()
+
+    assert not store.is_complete("agent", "env", run_params)
+    store.write(history, {"something": 1}, "agent", "env", run_params)
+    assert store.is_complete("agent", "env", run_params)
+
+    written = pd.read_parquet(tmpdir / "agent_id=agent__env_id=env.parquet")
+    assert written["observation_0"].to_list() == [1, 1]
+
+
+def test_write_streaming_without_streamed_history(tmpdir):
+    run_params = {"output_directory": str(tmpdir), "stream_row_group_size": 2}
+
+    with pytest.raises(ValueError, match=r"No history was streamed"):
+        store.write(pd.DataFrame({"a": [1, 2]}), {"something": 1}, "agent", "env", run_params)
+    assert not store.is_complete("agent", "env", run_params)
+
+
+def test_open_history_not_streaming(tmpdir):
+    assert store.open_history("agent", "env", {"output_directory": str(tmpdir)}) is None
+
+
+def test_write_dataset(tmpdir):
+    run_params = {"output_directory": str(tmpdir), "output_format": "dataset"}
+    for agent_id in ["user/agent-v0", "other_agent-v0"]:
+        for env_id in ["Env:1-v0", "Env:2-v0"]:
+            history = pd.DataFrame({"reward": [1.0, 2.0]})
+            summary = store.summarise(history, 10, agent_id, env_id, run_params)
+            store.write(history, summary, agent_id, env_id, run_params)
+            assert store.is_complete(agent_id, env_id, run_params)
+
+    history = (
+        store.dataset(str(tmpdir)).to_table(filter=ds.field("env_id") == "Env:2-v0").to_pandas()
+    )
+    assert len(history) == 4
+    assert set(history.columns) == {"reward", "agent_id", "env_id", "replicate"}
+    assert history["replicate"].isnull().all()
+
+    store.consolidate(run_params)
+    summaries = pd.read_parquet(tmpdir / "summary.parquet")
+    assert len(summaries) == 4
+    assert summaries["avg_reward"].to_list() == [1.5] * 4
+    assert set(summaries["env_id"]) == {"Env:1-v0", "Env:2-v0"}
+    assert set(summaries["agent_id"]) == {"user/agent-v0", "other_agent-v0"}
+
+
+def test_consolidate_files_does_nothing(tmpdir):
+    store.consolidate({"output_directory": str(tmpdir), "output_format": "files"})
+    assert tmpdir.listdir() == []
+
+
+def test_background_writer(tmpdir):
+    run_params = {"output_directory": str(tmpdir)}
+    with store.BackgroundWriter(queue_size=1) as writer:
+        for env_id in ["env_1", "env_2", "env_3"]:
+            writer.write(pd.DataFrame({"a": [1]}), {"something": 1}, "agent", env_id, run_params)
+
+    for env_id in ["env_1", "env_2", "env_3"]:
+        assert store.is_complete("agent", env_id, run_params)
+
+
+def test_background_writer_queues_a_write_per_run(tmpdir, mocker):
+    run_params = {"output_directory": str(tmpdir)}
+    writing, written = threading.Event(), threading.Event()
+
+    def wait_to_write(*args):
+        writing.set()
+        assert written.wait(5)
+
+    mocker.patch.object(store, "write", side_effect=wait_to_write)
+    writer = store.BackgroundWriter(queue_size=1)
+    writer.write(pd.DataFrame({"a": [1]}), {"something": 1}, "agent", "env_1", run_params)
+    assert writing.wait(5)
+    # While the first run is being written, the history and summary of a run fill the queue
+    queue_run = threading.Thread(
+        target=writer.write,
+        args=(pd.DataFrame({"a": [1]}), {"something": 1}, "agent", "env_2", run_params),
+        daemon=True,
+    )
+    queue_run.start()
+    queue_run.join(5)
+    assert not queue_run.is_alive()
+    assert writer._queue.full()
+
+    written.set()
+    writer.close()
+    assert store.write.call_count == 2
+
+
+def test_background_writer_raises_failed_writes(tmpdir):
+    run_params = {"output_directory": str(tmpdir)}
+    missing_dir_params = {"output_directory": str(tmpdir / "missing")}
+    writer = store.BackgroundWriter(queue_size=1)
+    writer.write(pd.DataFrame({"a": [1]}), {"something": 1}, "agent", "env_1", missing_dir_params)
+    writer.write(pd.DataFrame({"a": [1]}), {"something": 1}, "agent", "env_2", run_params)
+
+    with pytest.raises(errors.RunFailed, match=r"1 writes failed.*env_1"):
+        writer.close()
+    # The write after the failed one still went ahead
+    assert store.is_complete("agent", "env_2", run_params)
+
+
+def test_aggregate():
+    summaries = [
+        {"avg_reward": reward, "num_steps": 10, "time_seconds": 2, "agent_id": "a", "env_id": "e"}
+        for reward in [1.0, 2.0, 3.0, 6.0]
+    ]
+    summary = store.aggregate(summaries, "a", "e")
+
+    assert summary["avg_reward"] == 3
+    assert summary["avg_reward_std"] == pytest.approx(np.sqrt(14 / 3))
+    # The t quantile of 3 degrees of freedom, 3.182, times the standard error, sqrt(14 / 3) / 2
+    assert summary["avg_reward_ci_low"] == pytest.approx(3 - 3.4374349)
+    assert summary["avg_reward_ci_high"] == pytest.approx(3 + 3.4374349)
+    assert summary["num_steps"] == 10
+    assert summary["time_seconds"] == 8
+    assert summary["num_replicates"] == 4
+    assert (summary["agent_id"], summary["env_id"]) == ("a", "e")
+
+
+@pytest.mark.parametrize(
+    "output_format, history_fps",
+    [
+        (
+            "files",
+            [
+                "agent_id=agent__env_id=env__replicate=0.parquet",
+                "agent_id=agent__env_id=env__replicate=1.parquet",
+            ],
+        ),
+        (
+            "dataset",
+            [
+                "history/agent_id=agent/env_id=env/replicate=0/part-0.parquet",
+                "history/agent_id=agent/env_id=env/replicate=1/part-0.parquet",
+            ],
+        ),
+    ],
+)
+def test_write_replicates(tmpdir, output_format, history_fps):
+    run_params = {
+        "output_directory": str(tmpdir),
+        "num_replicates": 2,
+        "output_format": output_format,
+    }
+    for replicate in range(2):
+        store.write_history(
+            pd.DataFrame({"a": [replicate]}), "agent", "env", run_params, replicate
+        )
+    assert not store.is_complete("agent", "env", run_params)
+
+    store.write_summary({"something": 1}, "agent", "env", run_params)
+
+    assert store.is_complete("agent", "env", run_params)
+    for replicate, history_fp in enumerate(history_fps):
+        assert pd.read_parquet(tmpdir / history_fp)["a"].tolist() == [replicate]
+    (tmpdir / history_fps[1]).remove()
+    assert not store.is_complete("agent", "env", run_params)
+
+
+def test_dataset_replicates(tmpdir):
+    run_params = {"output_directory": str(tmpdir), "output_format": "dataset"}
+    for replicate in range(2):
+        history = pd.DataFrame({"reward": [replicate, replicate + 2]})
+        store.write_history(
+            history, "agent", "env", {**run_params, "num_replicates": 2}, replicate
+        )
+    store.write_history(pd.DataFrame({"reward": [9]}), "other", "env", run_params)
+
+    history = store.dataset(str(tmpdir)).to_table().to_pandas()
+
+    replicated = history[history["agent_id"] == "agent"]
+    assert replicated.groupby("replicate")["reward"].mean().to_dict() == {0: 1, 1: 2}
+    assert history.loc[history["agent_id"] == "other", "replicate"].isnull().all()
+
+
+def test_background_writer_skips_summary_of_failed_history(tmpdir, mocker):
+    run_params = {"output_directory": str(tmpdir), "num_replicates": 2}
+    mocker.patch.object(store, "_write_atomic", side_effect=[OSError("Disk full"), None, None])
+    write_summary = mocker.spy(store, "write_summary")
+    writer = store.BackgroundWriter(queue_size=0)
+    writer.write_history(pd.DataFrame({"a": [1]}), "agent", "env_1", run_params, 0)
+    writer.write_summary({"something": 1}, "agent", "env_1", run_params)
+    writer.write_history(pd.DataFrame({"a": [1]}), "agent", "env_2", run_params, 0)
+    writer.write_summary({"something": 1}, "agent", "env_2", run_params)
+
+    with pytest.raises(errors.RunFailed, match=r"1 writes failed.*env_1"):
+        writer.close()
+    assert [call[0][2] for call in write_summary.call_args_list] == ["env_2"]
+
+
+def test_summarise_regret():
+    history = pd.DataFrame({"reward": [np.nan, 1, 1], "expected_regret": [np.nan, 2, 3]})
+    summary = store.summarise(history, 10, "test_agent", "test_env", run_params=None)
+
+    assert summary["cumulative_expected_regret"] == 5
+
+
+def test_aggregate_few_replicates():
+    summaries = [{"avg_reward": reward, "time_seconds": 1} for reward in [1.0, 2.0, 6.0]]
+    summary = store.aggregate(summaries, "a", "e")
+
+    # Mean 3, standard deviation sqrt(7), and the t quantile of 2 degrees of freedom, 4.303
+    half_width = 4.3026527 * np.sqrt(7) / np.sqrt(3)
+    assert summary["avg_reward_ci_low"] == pytest.approx(3 - half_width)
+    assert summary["avg_reward_ci_high"] == pytest.approx(3 + half_width)
+    assert summary["avg_reward_ci_high"] == pytest.approx(9.5724106)
+
+
+def test_aggregate_regret():
+    summaries = [
+        {"avg_reward": 1.0, "cumulative_expected_regret": regret, "time_seconds": 1}
+        for regret in [1.0, 3.0]
+    ]
+    summary = store.aggregate(summaries, "a", "e")
+
+    assert summary["cumulative_expected_regret"] == 2
+    assert summary["cumulative_expected_regret_std"] == pytest.approx(np.sqrt(2))
+    assert summary["cumulative_expected_regret_ci_low"] < 2
+    assert summary["avg_reward_std"] == 0
+
+
+def test_summarise_batch():
+    history = pd.DataFrame({"replica": [0, 0, 0, 1, 1, 1], "reward": [np.nan, 1, 2, np.nan, 3, 4]})
+    summary = store.summarise(history, 10, "test_agent", "test_env", run_params=None)
+
+    assert summary["avg_reward"] == 2.5
+    assert summary["num_steps"] == 2
+    assert summary["num_replicas"] == 2
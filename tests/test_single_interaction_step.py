@@ -1,11 +1,24 @@
+import gym
+import numpy as np
 import pytest
 
+import truman
 from truman import single_interaction_step
+from truman.run import simulation
+
+
+class RandomAgent:
+    def __init__(self, env):
+        self.action_space = env.action_space
+
+    def act(self, previous_observation):
+        return self.action_space.sample(), {}
 
 
 @pytest.fixture()
 def fix_random(mocker):
     mocker.patch("numpy.random.random", return_value=0.5)
+    mocker.patch.object(single_interaction_step.UniformBuffer, "next", return_value=0.5)
 
 
 def test_bandit(fix_random):
@@ -22,6 +35,26 @@ def test_bandit_multiplier(fix_random):
     assert low_bandit.action(multiplier=6)
 
 
+def test_bandit_uniform():
+    bandit = single_interaction_step.Bandit(conversion_rate=0.5)
+
+    assert bandit.action(uniform=0.4)
+    assert not bandit.action(uniform=0.6)
+    assert bandit.action(multiplier=2, uniform=0.99)
+
+
+@pytest.mark.parametrize("sizes", [[1] * 10, [3, 7], [10], [4, 0, 6]])
+def test_uniform_buffer(sizes):
+    buffer = single_interaction_step.UniformBuffer(block_size=4, seed=1)
+    expected = np.random.default_rng(1).random(12)[:10]
+
+    taken = np.concatenate([buffer.take(size) if size != 1 else [buffer.next()] for size in sizes])
+    np.testing.assert_array_equal(taken, expected)
+
+    buffer.seed(1)
+    assert buffer.next() == expected[0]
+
+
 def test_basic_discrete_bernoulli_bandit():
     always_bandit = single_interaction_step.Bandit(conversion_rate=1)
     never_bandit = single_interaction_step.Bandit(conversion_rate=0)
@@ -99,6 +132,21 @@ def test_heirarchical_static_bernoulli_bandits_context_keys():
     assert env.context_keys == {"country": ["always", "never"]}
 
 
+def test_heirarchical_static_bernoulli_bandits_conversion_rates():
+    bandits = [single_interaction_step.Bandit(0.1), single_interaction_step.Bandit(0.5)]
+    context = {"country": {"uk": 1.0, "fr": 3.0}, "device": {"mobile": 0.5, "pc": 1.0, "tv": 0}}
+    env = single_interaction_step.HeirarchicalStaticBernoulliBandits(bandits, context)
+
+    assert env.conversion_rates.shape == (2, 2, 3)
+    assert env.conversion_rates[0, 1, 0] == pytest.approx(0.15)
+    assert env.conversion_rates[1, 0, 1] == 0.5
+    # Clipped to at most 1
+    assert env.conversion_rates[1, 1, 1] == 1
+    assert (env.conversion_rates[:, :, 2] == 0).all()
+    with pytest.raises(ValueError):
+        env.conversion_rates[0, 0, 0] = 1
+
+
 def test_weekly_periodicity():
     """Test weekly periodicity factory."""
     periodicity_func = single_interaction_step.weekly_periodicity([1.0] * 5 + [1.2] * 2)
@@ -117,9 +165,8 @@ def test_weekly_periodicity():
 
 
 def test_random_walk_trend(mocker):
-    mocker.patch("numpy.random.random", side_effect=[0.0, 0.4, 0.6, 1])
-
     random_walk = single_interaction_step.RandomWalkTrend(lower=0.0, upper=1.0, step_size=1.0)
+    random_walk.rng = mocker.Mock(random=mocker.Mock(side_effect=[0.0, 0.4, 0.6, 1]))
 
     assert random_walk.step() == 0.0
     assert random_walk.step() == 0.0
@@ -161,3 +208,252 @@ def test_timestep_contextual_bernoulli_bandit(fix_random):
         observation, reward, done, info = env.step(selected_bandit=1)
         assert not observation
         assert reward == 0.0
+
+
+def _contextual_bandits():
+    bandits = [single_interaction_step.Bandit(0.3), single_interaction_step.Bandit(0.6)]
+    periodicity = single_interaction_step.Periodicity(
+        single_interaction_step.weekly_periodicity([1.0] * 5 + [1.5] * 2)
+    )
+    return single_interaction_step.TimestepContextualBernoulliBandits(bandits, [periodicity])
+
+
+@pytest.mark.parametrize(
+    "make_env, actions",
+    [
+        (
+            lambda: single_interaction_step.BasicDiscreteBernoulliBandits(
+                [single_interaction_step.Bandit(0.3), single_interaction_step.Bandit(0.6)]
+            ),
+            np.arange(100) % 2,
+        ),
+        (
+            lambda: single_interaction_step.HeirarchicalStaticBernoulliBandits(
+                [single_interaction_step.Bandit(0.3), single_interaction_step.Bandit(0.6)],
+                {"country": {"uk": 1.0, "fr": 1.5}, "device": {"mobile": 0.5, "pc": 1.0}},
+            ),
+            np.stack([np.arange(100) % 2, np.arange(100) // 2 % 2, np.arange(100) // 4 % 2], 1),
+        ),
+        (_contextual_bandits, np.arange(100) % 2),
+    ],
+)
+def test_step_many(make_env, actions):
+    env_1, env_2 = make_env(), make_env()
+    env_1.seed(2021)
+    env_2.seed(2021)
+
+    observations, rewards, dones, _ = env_1.step_many(actions)
+    expected = [env_2.step(action) for action in actions]
+
+    np.testing.assert_array_equal(observations, [step[0] for step in expected])
+    np.testing.assert_array_equal(rewards, [step[1] for step in expected])
+    assert not dones.any()
+    # Steps continue from where the many steps left off
+    assert env_1.step(actions[0])[0] == env_2.step(actions[0])[0]
+
+
+@pytest.mark.parametrize(
+    "lower, upper, step_size", [(0.8, 1.2, 0.01), (0.9, 1.1, 0.1), (0, 1, 1), (1.0, 1.01, 0.01)]
+)
+def test_random_walk_trend_trajectory(lower, upper, step_size):
+    random_walks = [
+        single_interaction_step.RandomWalkTrend(lower, upper, step_size, seed=2021)
+        for _ in range(2)
+    ]
+
+    expected = [random_walks[0].step() for _ in range(1000)]
+    trajectory = np.concatenate([random_walks[1].trajectory(n) for n in [1, 499, 500]])
+
+    np.testing.assert_array_equal(trajectory, expected)
+    assert random_walks[1].modifier == random_walks[0].modifier
+
+
+@pytest.mark.parametrize("period", [None, 7])
+def test_periodicity_trajectory(period):
+    def periodicity_func(timestep):
+        return [1.0, 1.1, 1.2, 0.9, 0.8, 1.5, 1.5][timestep % 7]
+
+    periodicity = single_interaction_step.Periodicity(periodicity_func, period=period)
+    expected = [periodicity_func(timestep) for timestep in range(30)]
+
+    trajectory = np.concatenate([periodicity.trajectory(n) for n in [3, 20, 7]])
+    np.testing.assert_array_equal(trajectory, expected)
+    assert periodicity.timestep == 30
+
+
+def test_weekly_periodicity_period():
+    periodicity_func = single_interaction_step.weekly_periodicity([1.0] * 5 + [1.2] * 2)
+
+    assert single_interaction_step.Periodicity(periodicity_func).period == 7
+
+
+def test_timestep_contextual_bernoulli_bandit_regenerates_contexts():
+    class CountingModifier:
+        def __init__(self):
+            self.timestep = 0
+
+        def step(self):
+            self.timestep += 1
+            return self.timestep
+
+    modifier = CountingModifier()
+    periodicity = single_interaction_step.Periodicity(lambda timestep: timestep % 2 + 1)
+    env = single_interaction_step.TimestepContextualBernoulliBandits(
+        bandits=[single_interaction_step.Bandit(0.5)],
+        step_contexts=[modifier, periodicity],
+        horizon=4,
+    )
+
+    multipliers = [env.context_multipliers.next() for _ in range(3)]
+    multipliers += list(env.context_multipliers.take(7))
+    # Generated a horizon at a time
+    assert modifier.timestep == 12
+    np.testing.assert_array_equal(
+        multipliers, [step * ((step - 1) % 2 + 1) for step in range(1, 11)]
+    )
+
+
+def _bandit_envs():
+    bandits = [single_interaction_step.Bandit(0.3), single_interaction_step.Bandit(0.6)]
+    return [
+        single_interaction_step.BasicDiscreteBernoulliBandits(bandits, episode_length=10),
+        single_interaction_step.HeirarchicalStaticBernoulliBandits(
+            bandits, {"country": {"uk": 1.0, "fr": 1.5}}, episode_length=10
+        ),
+        single_interaction_step.weekly_with_trend([0.3, 0.6], episode_length=10),
+    ]
+
+
+@pytest.mark.parametrize("env_index", range(3))
+def test_bandit_envs_episode(env_index):
+    env = _bandit_envs()[env_index]
+    action = env.action_space.sample()
+
+    observation = env.reset()
+    assert env.observation_space.contains(observation)
+    dones = [env.step(action)[2] for _ in range(10)]
+    assert dones == [False] * 9 + [True]
+    with pytest.raises(gym.error.ResetNeeded):
+        env.step(action)
+
+    env.reset()
+    _, _, dones, _ = env.step_many([action] * 10)
+    np.testing.assert_array_equal(dones, [False] * 9 + [True])
+    with pytest.raises(gym.error.ResetNeeded):
+        env.step_many([action])
+
+
+@pytest.mark.parametrize("env_index", range(3))
+def test_bandit_envs_reset_seed_reproducible(env_index):
+    env = _bandit_envs()[env_index]
+    actions = [env.action_space.sample() for _ in range(10)]
+
+    env.reset(seed=2021)
+    observations_1 = [env.step(action)[0] for action in actions]
+    env.reset(seed=2021)
+    observations_2 = [env.step(action)[0] for action in actions]
+
+    np.testing.assert_array_equal(observations_1, observations_2)
+
+
+@pytest.mark.parametrize("env_index", range(3))
+def test_bandit_envs_clone(env_index):
+    env = _bandit_envs()[env_index]
+    env.seed(2021)
+    action = env.action_space.sample()
+    env.step(action)
+
+    clone = env.clone()
+    observations = [env.step(action)[0] for _ in range(9)]
+
+    assert clone.timestep == 1
+    np.testing.assert_array_equal([clone.step(action)[0] for _ in range(9)], observations)
+
+
+@pytest.mark.parametrize("env_index", range(3))
+def test_bandit_envs_get_set_state(env_index):
+    env = _bandit_envs()[env_index]
+    env.seed(2021)
+    action = env.action_space.sample()
+    env.step_many([action] * 3)
+
+    state = env.get_state()
+    observations = [env.step(action)[0] for _ in range(7)]
+    # The state can be restored any number of times, to the same outcomes
+    for _ in range(2):
+        env.set_state(state)
+        assert env.timestep == 3
+        np.testing.assert_array_equal([env.step(action)[0] for _ in range(7)], observations)
+
+
+def test_timestep_contextual_bernoulli_bandit_get_set_state_of_contexts():
+    class CountingModifier:
+        def __init__(self):
+            self.timestep = 0
+
+        def step(self):
+            self.timestep += 1
+            return 1.0
+
+    random_walk = single_interaction_step.RandomWalkTrend(0.8, 1.2, 0.01)
+    env = single_interaction_step.TimestepContextualBernoulliBandits(
+        [single_interaction_step.Bandit(0.5)], [random_walk, CountingModifier()], horizon=4
+    )
+    env.seed(2021)
+    env.step_many([0] * 6)
+
+    state = env.get_state()
+    env.step_many([0] * 6)
+    modifier, timestep = random_walk.modifier, env.step_contexts[1].timestep
+    env.set_state(state)
+
+    # Contexts with get_state are restored in place, and others by copy
+    assert env.step_contexts[0] is random_walk
+    assert env.step_contexts[1].timestep == 8
+    env.step_many([0] * 6)
+    assert (random_walk.modifier, env.step_contexts[1].timestep) == (modifier, timestep)
+
+
+def test_timestep_contextual_bernoulli_bandit_reset_resets_contexts():
+    env = single_interaction_step.weekly_with_trend(episode_length=100)
+    env.reset(seed=1)
+    env.step_many(np.zeros(100, dtype=int))
+    random_walk, periodicity = env.step_contexts
+
+    env.reset()
+
+    assert random_walk.modifier == 1.0
+    assert periodicity.timestep == 0
+
+
+def test_timestep_contextual_bernoulli_bandit_seeds_contexts():
+    envs = [single_interaction_step.weekly_with_trend() for _ in range(2)]
+    for env in envs:
+        env.seed(2021)
+        env.step_many(np.zeros(100, dtype=int))
+
+    trends = [env.step_contexts[0].modifier for env in envs]
+    assert trends[0] == trends[1]
+
+
+def test_weekly_with_trend_makes_independent_envs():
+    env_1, env_2 = (
+        single_interaction_step.weekly_with_trend(),
+        single_interaction_step.weekly_with_trend(),
+    )
+
+    assert env_1.step_contexts[0] is not env_2.step_contexts[0]
+    env_1.step_many(np.zeros(100, dtype=int))
+    assert env_2.step_contexts[0].modifier == 1.0
+    assert env_2.step_contexts[1].timestep == 0
+
+
+@pytest.mark.parametrize("history_backend", ["list", "columnar"])
+def test_registered_bandit_env_runs(history_backend):
+    env = truman.registry.env_specs["SingleInteractionStep:Basic:conv_1:0.1:conv_2:0.12-v0"].make()
+    run_params = {"max_iters": 2000, "history_backend": history_backend}
+
+    history_df, _ = simulation.run(RandomAgent(env), env, run_params)
+
+    assert len(history_df) == 1001
+    assert history_df["reward"].sum() == history_df["observation_0"].sum()
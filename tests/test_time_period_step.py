@@ -1,3 +1,6 @@
+import functools
+
+import numpy as np
 import pytest
 from gym.error import ResetNeeded
 
@@ -72,3 +75,155 @@ def test_matching_sin7_interaction():
         modifiers = time_period_step.matching_sin7_interaction(0, i, behaviour_params)
         assert 0 <= modifiers[0] <= 2
         assert 0 <= modifiers[1] <= 2
+
+
+def test_discrete_strategy_binomial_batch():
+    env = time_period_step.DiscreteStrategyBinomialBatch(
+        num_replicas=4,
+        cohort_size=10,
+        episode_length=2,
+        strategy_keys=["never", "always"],
+        behaviour_func=lambda strategy, timestep: (1.0, float(strategy)),
+    )
+
+    observations = env.reset()
+    assert observations.shape == (4, 2)
+    assert env.observation_space.contains(observations)
+
+    observations, rewards, dones, info = env.step(np.array([0, 1, 1, 0]))
+    assert observations.tolist() == [[10, 0], [10, 10], [10, 10], [10, 0]]
+    assert rewards.tolist() == [0.0, 10.0, 10.0, 0.0]
+    assert not dones.any()
+    assert info["conversion_prb"].tolist() == [0.0, 1.0, 1.0, 0.0]
+
+    _, _, dones, _ = env.step(np.array([0, 0, 0, 0]))
+    assert dones.all()
+    with pytest.raises(ResetNeeded):
+        env.step(np.array([0, 0, 0, 0]))
+
+
+def test_discrete_strategy_binomial_batch_raises_bad_actions():
+    env = time_period_step.DiscreteStrategyBinomialBatch(
+        num_replicas=2,
+        cohort_size=10,
+        episode_length=2,
+        strategy_keys=["dummy"],
+        behaviour_func=lambda strategy, timestep: (1, 1),
+    )
+
+    with pytest.raises(AssertionError):
+        env.step(np.array([0, 1]))
+    with pytest.raises(AssertionError):
+        env.step(np.array([0, 0, 0]))
+
+
+def test_discrete_strategy_binomial_seeding():
+    def make_env():
+        return time_period_step.DiscreteStrategyBinomial(
+            cohort_size=1000,
+            episode_length=10,
+            strategy_keys=["dummy"],
+            behaviour_func=lambda strat, timestep: (0.5, 0.5),
+        )
+
+    global_state = np.random.get_state()[1].copy()
+    env_1, env_2 = make_env(), make_env()
+    env_1.seed(2021)
+    env_2.reset(seed=2021)
+    # Seeding an env leaves the global numpy random state alone
+    assert (np.random.get_state()[1] == global_state).all()
+
+    results_1 = [tuple(env_1.step(0)[0]) for _ in range(10)]
+    results_2 = [tuple(env_2.step(0)[0]) for _ in range(10)]
+    assert results_1 == results_2
+
+    env_1.reset(seed=2021)
+    assert [tuple(env_1.step(0)[0]) for _ in range(10)] == results_1
+
+
+def test_discrete_strategy_binomial_common_random_numbers():
+    def make_env():
+        env = time_period_step.DiscreteStrategyBinomial(
+            cohort_size=1000,
+            episode_length=10,
+            strategy_keys=["a", "b"],
+            behaviour_func=lambda strat, timestep: [(0.5, 0.2), (0.4, 0.3)][strat],
+            common_random_numbers=True,
+        )
+        env.seed(2021)
+        return env
+
+    policy_1 = [0, 1, 1, 0, 1, 0, 0, 0, 1, 1]
+    policy_2 = [0, 0, 1, 1, 1, 0, 1, 0, 0, 1]
+    env_1, env_2 = make_env(), make_env()
+    results_1 = [tuple(env_1.step(action)[0]) for action in policy_1]
+    results_2 = [tuple(env_2.step(action)[0]) for action in policy_2]
+
+    # Identical outcomes of identical actions, whatever actions came before
+    for action_1, action_2, result_1, result_2 in zip(policy_1, policy_2, results_1, results_2):
+        assert (result_1 == result_2) == (action_1 == action_2)
+
+
+@pytest.mark.parametrize(
+    "env_class, action",
+    [
+        (time_period_step.DiscreteStrategyBinomial, 1),
+        (functools.partial(time_period_step.DiscreteStrategyBinomialBatch, 3), [0, 1, 1]),
+    ],
+)
+def test_precompute_behaviour(env_class, action):
+    behaviour_func = functools.partial(
+        time_period_step.matching_sin7_interaction,
+        behaviour_params={0: (0.5, 0.2), 1: (0.5, 0.3)},
+    )
+
+    def make_env(precompute_behaviour):
+        env = env_class(
+            cohort_size=1000,
+            episode_length=10,
+            strategy_keys=["a", "b"],
+            behaviour_func=behaviour_func,
+            precompute_behaviour=precompute_behaviour,
+        )
+        env.seed(2021)
+        return env
+
+    env_1, env_2 = make_env(False), make_env(True)
+    for _ in range(10):
+        observation_1, _, _, info_1 = env_1.step(action)
+        observation_2, _, _, info_2 = env_2.step(action)
+        np.testing.assert_array_equal(observation_1, observation_2)
+        np.testing.assert_array_equal(info_1["conversion_prb"], info_2["conversion_prb"])
+
+    # The table is shared by envs with the same behaviour, and can't be changed
+    assert make_env(True).behaviour is env_2.behaviour
+    assert env_2.behaviour.shape == (10, 2, 2)
+    with pytest.raises(ValueError):
+        env_2.behaviour[0, 0, 0] = 1
+
+
+@pytest.mark.parametrize(
+    "env_class, action",
+    [
+        (time_period_step.DiscreteStrategyBinomial, 1),
+        (functools.partial(time_period_step.DiscreteStrategyBinomialBatch, 3), [0, 1, 1]),
+    ],
+)
+def test_get_set_state(env_class, action):
+    env = env_class(
+        cohort_size=1000,
+        episode_length=10,
+        strategy_keys=["a", "b"],
+        behaviour_func=lambda strat, timestep: [(0.5, 0.2), (0.4, 0.3)][strat],
+    )
+    env.reset(seed=2021)
+    for _ in range(4):
+        env.step(action)
+
+    state = env.get_state()
+    results = [env.step(action)[0] for _ in range(6)]
+    # The state can be restored any number of times, to the same outcomes
+    for _ in range(2):
+        env.set_state(state)
+        assert env.timestep == 4
+        np.testing.assert_array_equal([env.step(action)[0] for _ in range(6)], results)
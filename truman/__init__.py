@@ -1,17 +1,47 @@
-"""Init and create global env registry."""
+"""Init and lazily create global env registry.
 
-from gym.envs import registration
+Importing truman is kept cheap; gym, pandas, etc are only imported once they're needed, e.g. by
+accessing `truman.registry` or running `truman.run`. Env modules are only imported once one of
+their envs is made.
+"""
+from typing import TYPE_CHECKING
+
+import importlib
 
-from truman import history  # noqa
 from truman._version import get_versions
 from truman.run.interface import run  # noqa
 
 
-# Global registry
-registry = registration.EnvRegistry()
+if TYPE_CHECKING:
+    from truman import env_registration
+
+# Global registry, declared but not assigned, so it's created by __getattr__ on first access
+registry: "env_registration.LazyEnvRegistry"
+
+# Submodules which are imported on first access as attributes of the package
+_LAZY_SUBMODULES = ["history"]
+
+
+def __getattr__(name: str):
+    """Create the global registry, or import a lazy submodule, on first access."""
+    if name == "registry":
+        return _create_registry()
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _create_registry():
+    global registry
+    from truman import env_registration, manifest
+
+    registry = env_registration.LazyEnvRegistry(path="truman:registry")
+    # Declare the envs of all env modules, whose `register` calls register the envs to registry
+    # when one of their envs is made
+    for module, ids in manifest.ENV_IDS.items():
+        registry.declare(module, ids)
 
-# import all env modules, these contain the `register` calls which register envs to registry
-from truman import time_period_step  # noqa
+    return registry
 
 
 __version__ = get_versions()["version"]
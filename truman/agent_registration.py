@@ -5,14 +5,17 @@ which can be passed to Truman's run interface.
 
 Based on: https://github.com/openai/gym/blob/master/gym/envs/registration.py
 """
-from typing import Callable, Optional, Union
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Mapping, Optional, Sequence, Union
 from truman.typing import Agent
 
 import importlib
+import itertools
 import logging
 import re
 
-from gym import Env
+
+if TYPE_CHECKING:
+    from gym import Env
 
 
 logger = logging.getLogger(__name__)
@@ -22,6 +25,9 @@ logger = logging.getLogger(__name__)
 # [username/](agent-name)-v(version)
 agent_id_re = re.compile(r"^(?:[\w:-]+\/)?([\w:.-]+)-v(\d+)$")
 
+# A parameter name or value in the ID of an agent in a grid
+grid_token_re = re.compile(r"^[\w.-]+$")
+
 
 def _load(name: str):
     """Load a python object from string.
@@ -65,6 +71,9 @@ class AgentSpec:
         self.entry_point = entry_point
         self.nondeterministic = nondeterministic
         self._kwargs = {} if kwargs is None else kwargs
+        self._factory: Optional[Callable] = None
+        # The grid the agent is in, if any, whose entry point it shares
+        self._grid: Optional["AgentGrid"] = None
 
         match = agent_id_re.search(id)
         if not match:
@@ -73,7 +82,7 @@ class AgentSpec:
                 f"(Currently all IDs must be of the form {agent_id_re.pattern}.)"
             )
 
-    def make(self, env: Optional[Env] = None, **kwargs) -> Agent:
+    def make(self, env: Optional["Env"] = None, **kwargs) -> Agent:
         """Instantiates an instance of the agent compatible with given env."""
         if self.entry_point is None:
             raise ValueError(
@@ -82,18 +91,173 @@ class AgentSpec:
             )
         _kwargs = self._kwargs.copy()
         _kwargs.update(kwargs)
-        if callable(self.entry_point):
-            factory = self.entry_point
-        else:
-            factory = _load(self.entry_point)
-        agent = factory(env, **_kwargs)
+        agent = self.factory(env, **_kwargs)
 
         return agent
 
+    @property
+    def factory(self) -> Callable:
+        """The agent class or factory of the entry point, loaded once on first access."""
+        if self._factory is None:
+            if self.entry_point is None:
+                raise ValueError(f"Agent {self.id} is deprecated, and has no entry point.")
+            if self._grid is not None:
+                # Loaded once for the grid, rather than by each of the grid's specs
+                self._factory = self._grid.factory
+            elif callable(self.entry_point):
+                self._factory = self.entry_point
+            else:
+                self._factory = _load(self.entry_point)
+        return self._factory
+
     def __repr__(self):
         return "AgentSpec({})".format(self.id)
 
 
+class AgentGrid:
+    """A grid of agents, one for each combination of the values of each parameter.
+
+    The specs of the agents are made lazily, from their index in the grid, so large grids don't
+    need to be held in memory. Each agent's ID is generated from its parameters, in the format
+    `[username/](name):(param):(value)...-v(version)`, e.g. `Agent:epsilon:0.1:decay:0.99-v0`.
+
+    Args:
+        name: The name of the agents, [username/](agent-name)
+        entry_point: The python entrypoint of the agent class, as for AgentSpec. Loaded once
+            and shared by every agent in the grid.
+        param_grid: The values of each parameter; the grid is all of their combinations
+        version: The version of the agents
+        nondeterministic: Whether the agents are non-deterministic even after seeding
+        kwargs: The kwargs to pass to every agent, as well as its parameters
+        indices: The indices of the grid that are included, defaults to all of them
+    """
+
+    def __init__(
+        self,
+        name: str,
+        entry_point: Union[Callable, str],
+        param_grid: Mapping[str, Sequence],
+        version: int = 0,
+        nondeterministic: bool = False,
+        kwargs: Optional[dict] = None,
+        indices: Optional[range] = None,
+    ):
+        self.name = name
+        self.entry_point = entry_point
+        self.param_grid = {param: list(values) for param, values in param_grid.items()}
+        self.version = version
+        self.nondeterministic = nondeterministic
+        self._kwargs = {} if kwargs is None else kwargs
+        self._factory: Optional[Callable] = None
+
+        size = 1
+        for values in self.param_grid.values():
+            size *= len(values)
+        self.indices = range(size) if indices is None else indices
+
+        # The index of each value of each parameter, by its form in the agent ID
+        self._value_indices: Dict[str, Dict[str, int]] = {}
+        for param, values in self.param_grid.items():
+            tokens = [str(value) for value in values]
+            for token in [param] + tokens:
+                if not grid_token_re.search(token):
+                    raise ValueError(
+                        f"Attempted to register grid {name} with malformed parameter or value: "
+                        f"{token}. (Currently all must be of the form {grid_token_re.pattern}.)"
+                    )
+            if len(set(tokens)) != len(tokens):
+                raise ValueError(f"Repeated value of parameter {param} in grid {name}")
+            self._value_indices[param] = {token: i for i, token in enumerate(tokens)}
+        # Validate the name and version
+        self._spec({})
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i: int) -> AgentSpec:
+        """The spec of the i-th agent included in the grid."""
+        return self._spec_at(self.indices[i])
+
+    def __iter__(self) -> Iterator[AgentSpec]:
+        for index in self.indices:
+            yield self._spec_at(index)
+
+    def get(self, id: str) -> Optional[AgentSpec]:
+        """The spec of the agent with the given ID, or None if it's not included in the grid."""
+        prefix, suffix = f"{self.name}:", f"-v{self.version}"
+        if not (id.startswith(prefix) and id.endswith(suffix)):
+            return None
+        tokens = id[len(prefix) : len(id) - len(suffix)].split(":")
+        if tokens[::2] != list(self.param_grid):
+            return None
+
+        index = 0
+        for param, token in zip(tokens[::2], tokens[1::2]):
+            try:
+                value_index = self._value_indices[param][token]
+            except KeyError:
+                return None
+            index = index * len(self.param_grid[param]) + value_index
+        if index not in self.indices:
+            return None
+        return self._spec_at(index)
+
+    def shard(self, shard_index: int, num_shards: int) -> "AgentGrid":
+        """The grid of every num_shards-th agent of this grid, starting from shard_index."""
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"Shard index {shard_index} is not in range of {num_shards} shards")
+        shard = AgentGrid(
+            self.name,
+            self.entry_point,
+            self.param_grid,
+            self.version,
+            self.nondeterministic,
+            self._kwargs,
+            self.indices[shard_index::num_shards],
+        )
+        shard._factory = self._factory
+        return shard
+
+    @property
+    def factory(self) -> Callable:
+        """The agent class or factory of the entry point, loaded once on first access."""
+        if self._factory is None:
+            if callable(self.entry_point):
+                self._factory = self.entry_point
+            else:
+                self._factory = _load(self.entry_point)
+        return self._factory
+
+    def _spec_at(self, index: int) -> AgentSpec:
+        # Decode the index into the index of each parameter's value, the last parameter varying
+        # fastest
+        value_indices = []
+        for values in reversed(list(self.param_grid.values())):
+            index, value_index = divmod(index, len(values))
+            value_indices.append(value_index)
+        params = {
+            param: values[value_index]
+            for (param, values), value_index in zip(
+                self.param_grid.items(), reversed(value_indices)
+            )
+        }
+        return self._spec(params)
+
+    def _spec(self, params: dict) -> AgentSpec:
+        param_id = "".join(f":{param}:{value}" for param, value in params.items())
+        spec = AgentSpec(
+            f"{self.name}{param_id}-v{self.version}",
+            self.entry_point,
+            self.nondeterministic,
+            {**self._kwargs, **params},
+        )
+        spec._grid = self
+        return spec
+
+    def __repr__(self):
+        return "AgentGrid({}-v{})".format(self.name, self.version)
+
+
 class AgentRegistry:
     """Register an agent by ID.
 
@@ -103,18 +267,72 @@ class AgentRegistry:
 
     def __init__(self):
         self.agent_specs = {}
+        self.agent_grids = []
 
-    def make(self, id: str, env: Optional[Env] = None, **kwargs) -> Agent:
+    def make(self, id: str, env: Optional["Env"] = None, **kwargs) -> Agent:
         """Instantiate an instance of an agent of the given ID compatible with the given env."""
         logging.info(f"Making new agent: {id} ({kwargs})")
-        try:
-            return self.agent_specs[id].make(env, **kwargs)
-        except KeyError:
+        spec = self.spec(id)
+        if spec is None:
             raise KeyError(f"No registered agent with ID {id}")
+        return spec.make(env, **kwargs)
+
+    def spec(self, id: str) -> Optional[AgentSpec]:
+        """Return the spec of the agent with the given ID, or None if there's no such agent."""
+        if id in self.agent_specs:
+            return self.agent_specs[id]
+        for grid in self.agent_grids:
+            spec = grid.get(id)
+            if spec is not None:
+                return spec
+        return None
+
+    def all(self) -> Iterator[AgentSpec]:
+        """Return all the agents in the registry.
 
-    def all(self):
-        """Return all the agents in the registry."""
-        return self.agent_specs.values()
+        The specs of agents registered in grids are made as they're iterated over, so this is a
+        one-shot iterator; wrap it in `list()` to take its length or iterate over it again.
+        """
+        return itertools.chain(self.agent_specs.values(), *self.agent_grids)
+
+    def shard(self, shard_index: int, num_shards: int) -> "AgentRegistry":
+        """Return a registry of every num_shards-th agent of the registry, from shard_index.
+
+        Together, the num_shards shards include every agent exactly once, so they can be run
+        separately, e.g. by different workers or machines. Grids are sharded lazily, without
+        making the specs of their agents.
+        """
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"Shard index {shard_index} is not in range of {num_shards} shards")
+        shard = AgentRegistry()
+        shard.agent_specs = dict(
+            itertools.islice(self.agent_specs.items(), shard_index, None, num_shards)
+        )
+        # Offset each grid's shards by the agents before it, to balance the size of the shards
+        offset = len(self.agent_specs)
+        for grid in self.agent_grids:
+            shard.agent_grids.append(grid.shard((shard_index - offset) % num_shards, num_shards))
+            offset += len(grid)
+        return shard
+
+    def resolve_entry_points(self):
+        """Load the entry points of all agents up front, rather than when each is first made.
+
+        Raises:
+            ValueError: listing every agent whose entry point failed to load
+        """
+        failures = []
+        # A grid's entry point is shared by all its agents, so is resolved once for the grid
+        for spec in itertools.chain(self.agent_specs.values(), self.agent_grids):
+            try:
+                spec.factory
+            except Exception as error:
+                failures.append(f"{spec!r}: {error!r}")
+        if failures:
+            raise ValueError(
+                f"Failed to load the entry points of {len(failures)} agents:\n"
+                + "\n".join(failures)
+            )
 
     def register(
         self,
@@ -138,6 +356,48 @@ class AgentRegistry:
             nondeterministic: Whether this agent is non-deterministic even after seeding
             kwargs: The kwargs to pass to the agent entry point when instantiating the agent
         """
-        if id in self.agent_specs:
+        if self.spec(id) is not None:
             raise ValueError(f"Cannot re-register ID {id}")
         self.agent_specs[id] = AgentSpec(id, entry_point, nondeterministic, kwargs)
+
+    def register_grid(
+        self,
+        name: str,
+        entry_point: Union[Callable, str],
+        param_grid: Mapping[str, Sequence],
+        version: int = 0,
+        nondeterministic: bool = False,
+        kwargs: Optional[dict] = None,
+    ) -> AgentGrid:
+        """Register a grid of agents, one for each combination of the parameters' values.
+
+        The specs of the agents are made lazily, see AgentGrid.
+
+        Args:
+            name: The name of the agents, [username/](agent-name)
+            entry_point: The python entrypoint of the agent class, as for `register`
+            param_grid: The values of each parameter, passed to the agent as kwargs
+            version: The version of the agents
+            nondeterministic: Whether the agents are non-deterministic even after seeding
+            kwargs: The kwargs to pass to every agent, as well as its parameters
+
+        Returns:
+            the registered grid
+
+        Example:
+            >>> registry.register_grid(
+            ...     "EpsilonGreedy",
+            ...     "my_agents:EpsilonGreedy",
+            ...     {"epsilon": [0.01, 0.1], "decay": [0.9, 0.99]},
+            ... )
+            registers IDs "EpsilonGreedy:epsilon:0.01:decay:0.9-v0", etc.
+        """
+        grid = AgentGrid(name, entry_point, param_grid, version, nondeterministic, kwargs)
+        for other in self.agent_grids:
+            if (other.name, other.version) == (grid.name, grid.version):
+                raise ValueError(f"Cannot re-register grid {grid!r}")
+        clashing = [id for id in self.agent_specs if grid.get(id) is not None]
+        if clashing:
+            raise ValueError(f"Cannot re-register IDs {clashing} in grid {grid!r}")
+        self.agent_grids.append(grid)
+        return grid
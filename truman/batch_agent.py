@@ -0,0 +1,49 @@
+"""Adapting agents to act on batches of env replicas at once."""
+from typing import Callable, List, Optional, Sequence, Tuple
+from truman.typing import Agent
+
+import numpy as np
+
+
+class BatchedAgent:
+    """A batch agent (see truman.typing.BatchAgent) of a scalar agent for each env replica.
+
+    Each replica's agent acts on its replica's observations alone, with a call per replica each
+    step, so scalar agents can be run on batch envs, and compared with batch agents.
+
+    Args:
+        agents: the agent of each replica
+    """
+
+    def __init__(self, agents: Sequence[Agent]):
+        self.agents: List[Agent] = list(agents)
+
+    @classmethod
+    def from_factory(
+        cls,
+        factory: Callable[..., Agent],
+        num_replicas: int,
+        env: Optional[object] = None,
+        **kwargs,
+    ) -> "BatchedAgent":
+        """Make the agent of each replica, by calling the factory with the env and kwargs."""
+        return cls([factory(env, **kwargs) for _ in range(num_replicas)])
+
+    def act_batch(self, previous_observations) -> Tuple[np.ndarray, dict]:
+        """Choose each replica's action with its agent, given its previous observation.
+
+        Returns:
+            tuple of (array of the chosen actions, dict of arrays of the agents' extra information,
+                of the keys of the first agent's information)
+        """
+        if len(previous_observations) != len(self.agents):
+            raise ValueError(
+                f"Got observations of {len(previous_observations)} replicas, "
+                f"but have agents of {len(self.agents)}"
+            )
+        actions, infos = zip(
+            *[agent.act(obs) for agent, obs in zip(self.agents, previous_observations)]
+        )
+        return np.array(actions), {
+            name: np.array([info.get(name) for info in infos]) for name in infos[0]
+        }
@@ -0,0 +1,73 @@
+"""Lazy registration of envs.
+
+Envs can be declared to a LazyEnvRegistry by ID, along with the module which registers them,
+so that envs can be listed without importing the modules that define them. A module is only
+imported once one of its envs is made.
+"""
+from typing import Iterable
+
+import importlib
+
+from gym import error
+from gym.envs import registration
+
+
+class LazyEnvSpec(registration.EnvSpec):
+    """A declared env, whose full spec is registered when its module is imported.
+
+    Args:
+        id: the env's ID
+        module: the python module which registers the env's full spec when imported
+        registry: the python path of the registry the module registers to, e.g.
+            truman:registry
+    """
+
+    def __init__(self, id: str, module: str, registry: str):
+        super().__init__(id)
+        self.module = module
+        self.registry = registry
+
+    def resolve(self) -> registration.EnvSpec:
+        """Import the env's module, and return the full spec it registered."""
+        importlib.import_module(self.module)
+        spec = registration.load(self.registry).env_specs[self.id]
+        if isinstance(spec, LazyEnvSpec):
+            raise error.Error(f"Module {self.module} did not register declared env {self.id}")
+        return spec
+
+    def make(self, **kwargs):
+        """Instantiates an instance of the environment, importing its module if needed."""
+        return self.resolve().make(**kwargs)
+
+    def __repr__(self):
+        return "LazyEnvSpec({})".format(self.id)
+
+
+class LazyEnvRegistry(registration.EnvRegistry):
+    """An env registry which envs can be declared to, before they're registered.
+
+    Args:
+        path: the python path of the registry itself, e.g. truman:registry, so that declared
+            specs can find it (including in other processes) once their module is imported
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def declare(self, module: str, ids: Iterable[str]):
+        """Declare envs which the given module registers when it's imported."""
+        for id in ids:
+            if id in self.env_specs:
+                raise error.Error(f"Cannot re-register id: {id}")
+            self.env_specs[id] = LazyEnvSpec(id, module, self.path)
+
+    def register(self, id: str, **kwargs):
+        """Register an env, replacing its declaration if it was declared.
+
+        The declaration is replaced in place, so the registry's envs keep their order, and can be
+        registered while the registry's specs are being iterated over, e.g. by making them.
+        """
+        if id in self.env_specs and not isinstance(self.env_specs[id], LazyEnvSpec):
+            raise error.Error(f"Cannot re-register id: {id}")
+        self.env_specs[id] = registration.EnvSpec(id, **kwargs)
@@ -3,3 +3,7 @@
 
 class StoppedEarly(Exception):
     """Raised when a run is forced to stop before the environment has finished."""
+
+
+class RunFailed(Exception):
+    """Raised when one or more agent/env pairs of a run failed."""
@@ -1,7 +1,16 @@
 """Interfacing with histories of env & agent (the system)."""
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import os
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-from truman import plot
+
+if TYPE_CHECKING:
+    import gym
 
 
 class History:
@@ -48,7 +57,7 @@ class History:
         df["reward"] = self.rewards
         df["done"] = self.dones
         for prefix, infos in zip(["", "agent_"], [self.infos, self.agent_infos]):
-            for i, name in enumerate(infos[1].keys()):  # info is None on step 0
+            for name in _info_names(infos):
                 df[prefix + name] = [i[name] if i is not None else None for i in infos]
         return df
 
@@ -59,5 +68,266 @@ class History:
         ax=None,
     ):
         """Plot history."""
+        # Imported here, as importing matplotlib is slow
+        from truman import plot
+
         df = self.to_df()
         plot.plot(df, alpha=alpha, use_cols=use_cols, ax=ax)
+
+
+class BatchHistory(History):
+    """A history of a batch of env replicas stepped together, e.g. DiscreteStrategyBinomialBatch.
+
+    The events of every replica are appended at once, as arrays with a leading replica dimension,
+    and infos as dicts of such arrays (or of scalars, shared by every replica).
+    """
+
+    def to_df(self):
+        """Return history of all system events of every replica as a dataframe.
+
+        Rows are ordered by replica and then step, and each replica's rows are as in
+        `History.to_df`, with a "replica" column of the replica's index. The missing events of
+        the initial step are missing values of integer and boolean (nullable) columns, NaNs of
+        float columns, or Nones.
+        """
+        num_replicas = len(self.observations[0])
+        num_rows = len(self.observations)
+        df = pd.DataFrame({"replica": np.repeat(np.arange(num_replicas), num_rows)})
+        df["action"] = _replica_major_column(self.actions, num_replicas)
+        observations = _replica_major(self.observations, num_replicas)[0]
+        for i in range(observations.shape[1]):
+            df[f"observation_{i}"] = observations[:, i]
+        df["reward"] = _replica_major_column(self.rewards, num_replicas)
+        df["done"] = _replica_major_column(self.dones, num_replicas)
+        for prefix, infos in zip(["", "agent_"], [self.infos, self.agent_infos]):
+            for name in _info_names(infos):
+                events = [i[name] if i is not None else None for i in infos]
+                df[prefix + name] = _replica_major_column(events, num_replicas)
+        return df
+
+
+def _replica_major(events: list, num_replicas: int):
+    """Stack the events of each step, of every replica, in order of replica and then step.
+
+    Returns:
+        tuple of (array of the events, with missing events zeroed, boolean mask of the rows of
+            missing events)
+    """
+    template = np.asarray(next(event for event in events if event is not None))
+    shape = (num_replicas, *template.shape[1:])
+    values = np.stack(
+        [
+            np.zeros(shape, template.dtype) if event is None else np.broadcast_to(event, shape)
+            for event in events
+        ],
+        axis=1,
+    )
+    missing = np.array([event is None for event in events])
+    return values.reshape(-1, *shape[1:]), np.tile(missing, num_replicas)
+
+
+def _replica_major_column(events: list, num_replicas: int):
+    values, missing = _replica_major(events, num_replicas)
+    if values.dtype.kind in "iu":
+        return pd.arrays.IntegerArray(values.astype(np.int64), missing)
+    if values.dtype.kind == "b":
+        return pd.arrays.BooleanArray(values, missing)
+    if values.dtype.kind == "f":
+        return np.where(missing, np.nan, values)
+    column = values.astype(object)
+    column[missing] = None
+    return column
+
+
+def _info_names(infos: list):
+    # info is None on step 0
+    return next((info for info in infos if info is not None), {}).keys()
+
+
+class ColumnarHistory(History):
+    """A history which stores events in preallocated typed numpy arrays, one per column.
+
+    Space for `capacity` steps is allocated up front, and doubled whenever it runs out. Events
+    recorded with a `None` action (the initial observation on reset) have missing values in
+    every column other than the observations, which are zeros in the observable() arrays.
+
+    Args:
+        observation_space: the env's observation space, used to type the observation columns
+        action_space: the env's action space, used to type the action column
+        capacity: the number of steps to allocate space for up front, e.g. max_iters + 1
+    """
+
+    def __init__(self, observation_space: "gym.Space", action_space: "gym.Space", capacity: int):
+        self._size = 0
+        self._missing = np.empty(capacity, dtype=bool)
+        self._actions = np.empty((capacity, *action_space.shape), dtype=action_space.dtype)
+        # Column-major, so each observation column is contiguous
+        self._observations = np.empty(
+            (capacity, int(np.prod(observation_space.shape))),
+            dtype=observation_space.dtype,
+            order="F",
+        )
+        self._rewards = np.empty(capacity, dtype=float)
+        self._dones = np.empty(capacity, dtype=bool)
+        # Info columns are allocated on the first step that each info name appears
+        self._infos: Dict[str, np.ndarray] = {}
+        self._agent_infos: Dict[str, np.ndarray] = {}
+
+    def append(self, action, observation, reward, done, info, agent_info):
+        """Append events from a single step to the history."""
+        if self._size == len(self._missing):
+            self._grow()
+        i = self._size
+        missing = action is None
+        self._missing[i] = missing
+        self._observations[i] = np.ravel(observation)
+        if not missing:
+            self._actions[i] = action
+            self._rewards[i] = reward
+            self._dones[i] = done
+        else:
+            self._actions[i] = 0
+            self._rewards[i] = np.nan
+            self._dones[i] = False
+        for columns, values in [(self._infos, info), (self._agent_infos, agent_info)]:
+            for name, value in (values or {}).items():
+                if name not in columns:
+                    columns[name] = self._info_column(value)
+                columns[name][i] = value
+        self._size += 1
+
+    def observable(self):
+        """Return history of system events that should be strictly available to an observer."""
+        n = self._size
+        return self._actions[:n], self._observations[:n], self._rewards[:n], self._dones[:n]
+
+    def all(self):
+        """Return history of all system events including internal/latent variables."""
+        n = self._size
+        return (
+            *self.observable(),
+            {name: column[:n] for name, column in self._infos.items()},
+            {name: column[:n] for name, column in self._agent_infos.items()},
+        )
+
+    def to_df(self):
+        """Return history of all system events as a dataframe, without copying the columns.
+
+        Observations are given column names using their index within the observations list.
+        The action column of a scalar integer action space, and the done column, use pandas'
+        nullable dtypes to represent the missing values.
+        """
+        n = self._size
+        missing = self._missing[:n]
+        columns = {"action": self._action_column(n)}
+        for i in range(self._observations.shape[1]):
+            columns[f"observation_{i}"] = self._observations[:n, i]
+        columns["reward"] = self._rewards[:n]
+        columns["done"] = pd.arrays.BooleanArray(self._dones[:n], missing)
+        for prefix, infos in zip(["", "agent_"], [self._infos, self._agent_infos]):
+            for name, column in infos.items():
+                columns[prefix + name] = column[:n]
+        return pd.DataFrame(columns, copy=False)
+
+    def _action_column(self, n: int):
+        actions = self._actions[:n]
+        if actions.ndim == 1 and np.issubdtype(actions.dtype, np.integer):
+            return pd.arrays.IntegerArray(actions.astype(np.int64, copy=False), self._missing[:n])
+        return [None if missing else a for a, missing in zip(actions, self._missing[:n])]
+
+    def _info_column(self, value) -> np.ndarray:
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_)):
+            # Floats, so missing steps can be NaN and no value is truncated
+            return np.full(len(self._missing), np.nan)
+        return np.full(len(self._missing), None, dtype=object)
+
+    def _grow(self):
+        def grow(array: np.ndarray) -> np.ndarray:
+            # Keeps the memory layout, and so the contiguous observation columns
+            grown = np.empty_like(array, shape=(2 * len(array), *array.shape[1:]))
+            grown[: len(array)] = array
+            return grown
+
+        def grow_info(column: np.ndarray) -> np.ndarray:
+            # Filled as allocated, so steps missing the info read as NaN or None
+            grown = np.full(
+                2 * len(column), np.nan if column.dtype == float else None, column.dtype
+            )
+            grown[: len(column)] = column
+            return grown
+
+        self._missing = grow(self._missing)
+        self._actions = grow(self._actions)
+        self._observations = grow(self._observations)
+        self._rewards = grow(self._rewards)
+        self._dones = grow(self._dones)
+        self._infos = {name: grow_info(column) for name, column in self._infos.items()}
+        self._agent_infos = {name: grow_info(column) for name, column in self._agent_infos.items()}
+
+
+class StreamingHistory(History):
+    """A history which streams events to a parquet file, in row groups, as they're appended.
+
+    At most `row_group_size` steps are held in memory at once, whatever the length of the
+    episode, so observable() and all() only return the events not yet written. Only the actions
+    and rewards are kept for the whole episode, to summarise it by.
+
+    Args:
+        path: path of the parquet file to write the history to
+        row_group_size: number of steps to write to the file at a time, at least 2
+    """
+
+    def __init__(self, path: str, row_group_size: int):
+        if row_group_size < 2:
+            raise ValueError("row_group_size must be at least 2.")
+        super().__init__()
+        self.path = path
+        self.row_group_size = row_group_size
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._actions: list = []
+        self._rewards: List[float] = []
+
+    def append(self, action, observation, reward, done, info, agent_info):
+        """Append events from a single step to the history, writing a row group if it's full."""
+        super().append(action, observation, reward, done, info, agent_info)
+        self._actions.append(action)
+        self._rewards.append(reward)
+        if len(self.actions) == self.row_group_size:
+            self._flush()
+
+    def to_df(self):
+        """Write any remaining events and close the file.
+
+        Returns:
+            dataframe of the actions and rewards of the full history, the only columns kept in
+            memory
+        """
+        if self.actions:
+            self._flush()
+        self._close()
+        return pd.DataFrame(
+            {"action": self._actions, "reward": pd.Series(self._rewards, dtype=float)}
+        )
+
+    def abort(self):
+        """Close and remove the file, discarding the history, e.g. when its run has failed."""
+        self._close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _flush(self):
+        df = super().to_df()
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            # Cast to the schema of the first row group, which has the missing initial step
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+        # Empty the buffered events
+        History.__init__(self)
@@ -0,0 +1,22 @@
+"""Manifest of the envs registered by each of truman's env modules.
+
+The env IDs are declared to `truman.registry` up front, so envs can be listed without importing
+the modules that register them. Keep in sync with the `register` calls of each module.
+"""
+
+_CONVERSION_RATES = [(0.2, 0.3), (0.02, 0.03), (0.002, 0.003)]
+_BANDIT_CONVERSION_RATES = [(0.01, 0.02), (0.1, 0.12)]
+
+# Env IDs by the module which registers them
+ENV_IDS = {
+    "truman.time_period_step": [
+        f"TimePeriodStep:{behaviour}:conv_1:{strat_1_conv}:conv_2:{strat_2_conv}-v0"
+        for behaviour in ["Static", "Matching_sin7", "NonStationaryTrend"]
+        for strat_1_conv, strat_2_conv in _CONVERSION_RATES
+    ],
+    "truman.single_interaction_step": [
+        f"SingleInteractionStep:{env}:conv_1:{bandit_1_conv}:conv_2:{bandit_2_conv}-v0"
+        for bandit_1_conv, bandit_2_conv in _BANDIT_CONVERSION_RATES
+        for env in ["Basic", "HeirarchicalStatic", "WeeklyWithTrend"]
+    ],
+}
@@ -0,0 +1,60 @@
+"""Oracles of the optimal strategies of envs, and the regret of agents against them.
+
+An oracle knows the expected reward of every strategy at every timestep of an env's episode,
+which is known for the time period step envs (DiscreteStrategyBinomial) from their behaviour.
+"""
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from truman import time_period_step
+
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from gym import Env
+
+
+def expected_rewards(env: "Env") -> np.ndarray:
+    """Compute the expected reward of every strategy at every timestep of the env's episode.
+
+    Returns:
+        array of shape (episode_length, num_strategies)
+    """
+    env = env.unwrapped
+    if not isinstance(env, time_period_step.DiscreteStrategyBinomial):
+        raise ValueError(f"No oracle of env {env}, only of DiscreteStrategyBinomial envs")
+    behaviour = env.behaviour
+    if behaviour is None:
+        behaviour = time_period_step.behaviour_table(
+            env.behaviour_func, env.episode_length, len(env.strategies)
+        )
+    return env.cohort_size * behaviour[..., 0] * behaviour[..., 1]
+
+
+def optimal_strategies(env: "Env") -> np.ndarray:
+    """Compute the strategy with the highest expected reward at every timestep of the episode."""
+    return expected_rewards(env).argmax(axis=1)
+
+
+def expected_regret(env: "Env", actions: np.ndarray) -> np.ndarray:
+    """Compute the expected regret of each of a sequence of actions, from the first timestep.
+
+    The expected regret of an action is the shortfall of its expected reward from that of the
+    optimal strategy at its timestep.
+    """
+    rewards = expected_rewards(env)
+    actions = np.asarray(actions, dtype=int)
+    timesteps = np.arange(len(actions))
+    return rewards[timesteps].max(axis=1) - rewards[timesteps, actions]
+
+
+def add_regret(history: "pd.DataFrame", env: "Env"):
+    """Add the expected regret of an episode's actions to its history, in place.
+
+    Adds the columns "expected_regret", of each step, and "cumulative_expected_regret". Both are
+    NaN in the first row, the initial observation, which has no action.
+    """
+    regret = expected_regret(env, history["action"].iloc[1:].to_numpy(dtype=int))
+    history["expected_regret"] = np.concatenate([[np.nan], regret])
+    history["cumulative_expected_regret"] = np.concatenate([[np.nan], np.cumsum(regret)])
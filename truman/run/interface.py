@@ -1,22 +1,53 @@
 """Interface for running an agent on an env suites."""
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 from truman.typing import Agent
 
-from gym import Env
-from gym.envs.registration import EnvRegistry
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
 
-from truman.agent_registration import AgentRegistry
-from truman.run import simulation, store
+from truman import errors
+from truman.agent_registration import AgentRegistry, AgentSpec
+from truman.run import scheduler, simulation, store
 
 
+if TYPE_CHECKING:
+    from gym import Env
+    from gym.envs.registration import EnvRegistry, EnvSpec
+
+
+logger = logging.getLogger(__name__)
+
 DEFAULT_PARAMS = {
     "output_directory": "",
     "max_iters": 100_000,
+    "workers": None,
+    "resume": False,
+    "history_backend": "list",
+    "stream_row_group_size": None,
+    "output_format": "files",
+    "write_queue_size": 0,
+    "timing": None,
+    "num_replicates": 1,
+    "seed": None,
+    "common_random_numbers": False,
+    "regret": False,
+    "scheduler": None,
+    "halving_rate": 2,
+    "resolve_entry_points": False,
 }
 REQUIRED_KEYS = ["output_directory"]
+# The options of the run parameters that take one of a few values
+PARAM_OPTIONS: Dict[str, List[Optional[str]]] = {
+    "history_backend": ["list", "columnar"],
+    "output_format": ["files", "dataset"],
+    "timing": [None, "summary", "history"],
+    "scheduler": scheduler.SCHEDULERS,
+}
 
 
-def run(agent_suite: AgentRegistry, env_suites: List[EnvRegistry], run_params: dict):
+def run(agent_suite: AgentRegistry, env_suites: List["EnvRegistry"], run_params: dict):
     """Run an agent on a list of environment suites.
 
     Args:
@@ -28,21 +59,261 @@ def run(agent_suite: AgentRegistry, env_suites: List[EnvRegistry], run_params: d
           - output_directory: directory to store the history and summary of each agent/environment
         Optional parameters
           - max_iters: int maximum iterations to run on an environment, default 100_000
+          - workers: int number of worker processes to run agent/environment pairs on in
+            parallel, default None runs every pair serially in the current process. Agent and
+            env specs (not instances) are sent to the workers, so must be picklable. A failing
+            pair does not stop the other pairs; a RunFailed error is raised once all have run.
+          - resume: bool whether to skip agent/environment pairs that already have a complete
+            history and summary in output_directory, default False
+          - history_backend: how each history is recorded during a run, one of "list" (default)
+            or "columnar", which preallocates typed numpy arrays from the env's observation
+            and action spaces
+          - stream_row_group_size: int number of steps to hold in memory before writing them to
+            the history's parquet file, as a row group, during the run. Default None writes
+            the whole history at the end of the run
+          - output_format: how histories and summaries are stored, one of "files" (default),
+            individual files for each agent/environment, or "dataset", parquet datasets
+            partitioned by agent and environment ID, and a consolidated `summary.parquet`. Each
+            pair's summary is kept in the summary dataset too, for `resume`
+          - write_queue_size: int number of completed runs (or replicate runs) that may be
+            queued for writing by a background thread while the next runs go ahead, when running
+            serially. Default 0 writes each run before starting the next
+          - timing: whether to time the agent and env separately at each step, one of None
+            (default), "summary", adding their total time and percentiles of their step times to
+            the summary, or "history", also adding each step's times to the history (not
+            supported with stream_row_group_size)
+          - num_replicates: int number of replicate runs of each agent/environment pair, default
+            1. Replicates' envs are seeded from `seed`, and each replicate's history is written
+            separately, suffixed `__replicate={i}` (or to a `replicate={i}` partition of the
+            pair's partition of the dataset). The pair's summary aggregates the replicates, with
+            the mean, standard deviation and 95% confidence interval of their avg_reward.
+            Replicates are run in parallel when `workers` is set
+          - seed: int seed from which the seed of each run's env is derived, default None doesn't
+            seed envs, unless running replicates or with common random numbers, when a seed is
+            chosen and logged
+          - common_random_numbers: bool whether every agent faces the same random outcomes of the
+            same actions on an env (in the same replicate), reducing the variance of comparisons
+            between agents, default False. Envs are made with `common_random_numbers=True`, so
+            must support it, e.g. DiscreteStrategyBinomial
+          - regret: bool whether to add the expected regret of each step's action against the
+            optimal strategy, and its cumulative sum, to histories (unless streamed), and the
+            cumulative expected regret to summaries, default False. Envs must have an oracle,
+            see truman.oracle
+          - scheduler: which agents are run on which envs, one of None (default), every agent on
+            every env, or "successive_halving", running the agents on the envs in rounds and
+            pruning the lowest ranked agents by avg_reward after each round, writing which were
+            pruned when to `schedule.csv` (or `schedule.parquet` for the "dataset"
+            output_format), see truman.run.scheduler.successive_halving
+          - halving_rate: number > 1 of agents per agent kept after each round of successive
+            halving, and the growth in the number of envs of each round, default 2
+          - resolve_entry_points: bool whether to load every agent's entry point before running,
+            failing fast with a list of all agents that can't be loaded, rather than part way
+            through the run, see AgentRegistry.resolve_entry_points. Default False loads each
+            entry point when its agent is first made
     """
     params = _parse_params(run_params)
     _check_no_clashing_ids(env_suites)
+    if params["resolve_entry_points"]:
+        agent_suite.resolve_entry_points()
+    if params["scheduler"] == "successive_halving":
+        scheduler.successive_halving(agent_suite, env_suites, params, _run_pairs)
+    else:
+        _run_pairs(_pairs(agent_suite, env_suites), params)
+    store.consolidate(params)
+
+
+def _run_pairs(pairs: Iterator[Tuple[AgentSpec, "EnvSpec"]], run_params: dict):
+    if run_params["resume"]:
+        pairs = _incomplete_pairs(pairs, run_params)
+    if run_params["workers"] is None:
+        _run_pairs_serial(pairs, run_params)
+    else:
+        _run_pairs_parallel(pairs, run_params)
+
+
+def _pairs(
+    agent_suite: AgentRegistry, env_suites: List["EnvRegistry"]
+) -> Iterator[Tuple[AgentSpec, "EnvSpec"]]:
     for env_suite in env_suites:
-        for env_spec in env_suite.all():
+        # A snapshot, as making envs may register them to a lazy registry, changing its specs
+        for env_spec in list(env_suite.all()):
             for agent_spec in agent_suite.all():
-                env = env_spec.make()
-                agent = agent_spec.make(env)
-                _run_agent_env(agent, env, agent_spec.id, env_spec.id, params)
+                yield agent_spec, env_spec
+
+
+def _incomplete_pairs(
+    pairs: Iterator[Tuple[AgentSpec, "EnvSpec"]], run_params: dict
+) -> Iterator[Tuple[AgentSpec, "EnvSpec"]]:
+    for agent_spec, env_spec in pairs:
+        if store.is_complete(agent_spec.id, env_spec.id, run_params):
+            logger.info(f"Skipping completed run of agent {agent_spec.id} on env {env_spec.id}")
+        else:
+            yield agent_spec, env_spec
+
+
+def _run_pairs_serial(pairs: Iterator[Tuple[AgentSpec, "EnvSpec"]], run_params: dict):
+    if not run_params["write_queue_size"]:
+        for agent_spec, env_spec in pairs:
+            _run_replicates(agent_spec, env_spec, run_params)
+        return
+
+    with store.BackgroundWriter(run_params["write_queue_size"]) as writer:
+        for agent_spec, env_spec in pairs:
+            _run_replicates(agent_spec, env_spec, run_params, writer)
+
+
+def _run_replicates(
+    agent_spec: AgentSpec,
+    env_spec: "EnvSpec",
+    run_params: dict,
+    writer: Optional[store.BackgroundWriter] = None,
+):
+    if run_params["num_replicates"] == 1:
+        _run_pair(agent_spec, env_spec, run_params, writer)
+        return
+
+    summaries = [
+        _run_pair(agent_spec, env_spec, run_params, writer, replicate)
+        for replicate in range(run_params["num_replicates"])
+    ]
+    _write_aggregate(summaries, agent_spec.id, env_spec.id, run_params, writer)
+
+
+def _run_pair(
+    agent_spec: AgentSpec,
+    env_spec: "EnvSpec",
+    run_params: dict,
+    writer: Optional[store.BackgroundWriter] = None,
+    replicate: Optional[int] = None,
+) -> dict:
+    env_kwargs = {"common_random_numbers": True} if run_params["common_random_numbers"] else {}
+    env = env_spec.make(**env_kwargs)
+    seed = _replicate_seed(run_params, replicate)
+    if seed is not None:
+        env.seed(seed)
+    agent = agent_spec.make(env)
+    return _run_agent_env(agent, env, agent_spec.id, env_spec.id, run_params, writer, replicate)
 
 
-def _run_agent_env(agent: Agent, env: Env, agent_id: str, env_id: str, run_params: dict):
-    history, elapsed_time = simulation.run(agent, env, run_params)
+def _run_agent_env(
+    agent: Agent,
+    env: "Env",
+    agent_id: str,
+    env_id: str,
+    run_params: dict,
+    writer: Optional[store.BackgroundWriter] = None,
+    replicate: Optional[int] = None,
+) -> dict:
+    stream = store.open_history(agent_id, env_id, run_params, replicate)
+    try:
+        history, elapsed_time = simulation.run(agent, env, run_params, history=stream)
+    except BaseException:
+        # Don't leave an open, partly written stream behind
+        if stream is not None:
+            stream.abort()
+        raise
     summary = store.summarise(history, elapsed_time, agent_id, env_id, run_params)
-    store.write(history, summary, agent_id, env_id, run_params)
+    if replicate is None:
+        write = store.write if writer is None else writer.write
+        write(history, summary, agent_id, env_id, run_params)
+    else:
+        write_history = store.write_history if writer is None else writer.write_history
+        write_history(history, agent_id, env_id, run_params, replicate)
+    return summary
+
+
+def _write_aggregate(
+    summaries: List[dict],
+    agent_id: str,
+    env_id: str,
+    run_params: dict,
+    writer: Optional[store.BackgroundWriter] = None,
+):
+    summary = store.aggregate(summaries, agent_id, env_id)
+    write_summary = store.write_summary if writer is None else writer.write_summary
+    write_summary(summary, agent_id, env_id, run_params)
+
+
+def _replicate_seed(run_params: dict, replicate: Optional[int]) -> Optional[int]:
+    """The seed of the env of a (replicate) run, derived from the run_params seed."""
+    if run_params["seed"] is None:
+        return None
+    import numpy as np
+
+    # Spawned from the run's seed, so each replicate's seed is independent of the others and
+    # of the number of replicates
+    seed_sequence = np.random.SeedSequence(run_params["seed"], spawn_key=(replicate or 0,))
+    return int(seed_sequence.generate_state(1, dtype=np.uint64)[0])
+
+
+def _run_pairs_parallel(pairs: Iterator[Tuple[AgentSpec, "EnvSpec"]], run_params: dict):
+    """Run each agent/env pair, or each replicate of each pair, in a pool of worker processes.
+
+    Each run writes its own history, so results don't depend on the order runs finish in. The
+    summary of a replicated pair is aggregated and written here once all its replicates are
+    complete. Runs are submitted as others complete, so lazily made agent specs (e.g. of an
+    AgentGrid) aren't all held in memory at once.
+    """
+    failed: List[tuple] = []
+    num_runs = 0
+    # Enough runs to keep every worker busy, with another queued to follow each
+    max_pending = 2 * run_params["workers"]
+    pending: Dict[concurrent.futures.Future, Tuple[str, str, Optional[int]]] = {}
+    # Summaries of the completed replicates of each pair, by replicate
+    replicate_summaries: Dict[Tuple[str, str], Dict[int, dict]] = collections.defaultdict(dict)
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=run_params["workers"], mp_context=context
+    ) as executor:
+        for agent_spec, env_spec in pairs:
+            for replicate in store.replicates(run_params):
+                if len(pending) >= max_pending:
+                    failed += _wait_for_runs(pending, replicate_summaries, run_params)
+                future = executor.submit(
+                    _run_pair, agent_spec, env_spec, run_params, replicate=replicate
+                )
+                pending[future] = (agent_spec.id, env_spec.id, replicate)
+                num_runs += 1
+        while pending:
+            failed += _wait_for_runs(pending, replicate_summaries, run_params)
+
+    if failed:
+        raise errors.RunFailed(f"{len(failed)} of {num_runs} runs failed: {sorted(failed)}")
+
+
+def _wait_for_runs(
+    pending: Dict[concurrent.futures.Future, Tuple[str, str, Optional[int]]],
+    replicate_summaries: Dict[Tuple[str, str], Dict[int, dict]],
+    run_params: dict,
+) -> List[tuple]:
+    """Wait for at least one pending run to complete, and remove the completed runs from pending.
+
+    Once every replicate of a pair is complete, the pair's aggregated summary is written.
+
+    Returns:
+        the agent and env IDs, and replicate if replicated, of the completed runs that failed
+    """
+    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+    failed: List[tuple] = []
+    for future in done:
+        agent_id, env_id, replicate = pending.pop(future)
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Run failed for agent {agent_id} on env {env_id}: {error!r}")
+            failed.append(
+                (agent_id, env_id) if replicate is None else (agent_id, env_id, replicate)
+            )
+            continue
+        if replicate is None:
+            continue
+        summaries = replicate_summaries[(agent_id, env_id)]
+        summaries[replicate] = future.result()
+        if len(summaries) == run_params["num_replicates"]:
+            del replicate_summaries[(agent_id, env_id)]
+            _write_aggregate(
+                [summaries[i] for i in sorted(summaries)], agent_id, env_id, run_params
+            )
+    return failed
 
 
 def _parse_params(run_params: dict) -> dict:
@@ -51,12 +322,33 @@ def _parse_params(run_params: dict) -> dict:
     if len(missing_keys) > 0:
         raise ValueError(f"Missing run parameters: {tuple(missing_keys)}")
 
-    parsed = DEFAULT_PARAMS.copy()
+    parsed: dict = DEFAULT_PARAMS.copy()
     parsed.update(run_params)
+
+    if parsed["num_replicates"] < 1:
+        raise ValueError(f"num_replicates must be at least 1, not {parsed['num_replicates']}")
+    for param, options in PARAM_OPTIONS.items():
+        if parsed[param] not in options:
+            raise ValueError(f"{param} must be one of {options}, not {parsed[param]!r}")
+    if parsed["timing"] == "history" and parsed["stream_row_group_size"]:
+        raise ValueError(
+            "timing of each step in the history isn't supported with stream_row_group_size, "
+            "as the steps are written before they're all timed; use timing 'summary'"
+        )
+    if parsed["halving_rate"] <= 1:
+        raise ValueError(f"halving_rate must be more than 1, not {parsed['halving_rate']}")
+    seeded = parsed["num_replicates"] > 1 or parsed["common_random_numbers"]
+    if seeded and parsed["seed"] is None:
+        import numpy as np
+
+        # Seeded from a fixed seed, so replicates can be reproduced, and every agent's envs are
+        # seeded alike for common random numbers
+        parsed["seed"] = np.random.SeedSequence().entropy
+        logger.info(f"Seeding envs with seed {parsed['seed']}")
     return parsed
 
 
-def _check_no_clashing_ids(env_suites: List[EnvRegistry]):
+def _check_no_clashing_ids(env_suites: List["EnvRegistry"]):
     ids = []
     for env_suite in env_suites:
         ids += [spec.id for spec in env_suite.all()]
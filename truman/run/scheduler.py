@@ -0,0 +1,143 @@
+"""Schedulers deciding which agents to run on which envs, adaptively from their results so far."""
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Sequence, Tuple
+
+import logging
+import math
+
+from truman.agent_registration import AgentRegistry, AgentSpec
+from truman.run import store
+
+
+if TYPE_CHECKING:
+    from gym.envs.registration import EnvRegistry, EnvSpec
+
+
+logger = logging.getLogger(__name__)
+
+SCHEDULERS = [None, "successive_halving"]
+
+# Runs the given agent/env pairs, writing their summaries, e.g. as truman.run does
+RunPairs = Callable[[Iterator[Tuple[AgentSpec, "EnvSpec"]], dict], None]
+
+
+def successive_halving(
+    agent_suite: AgentRegistry,
+    env_suites: List["EnvRegistry"],
+    run_params: dict,
+    run_pairs: RunPairs,
+) -> List[dict]:
+    """Run the agents on the envs in rounds, pruning the lowest ranked agents after each round.
+
+    The envs are split into rounds of about `halving_rate` times as many envs as the round
+    before, with as many rounds as it takes to prune the agents down to one (or one per env, if
+    there are too few envs). Each round, the remaining agents are run on the round's envs, and
+    ranked by their mean score over every env they've run, where an agent's score on an env is
+    the fraction of the other agents run on the env whose avg_reward it beat. The top
+    1/`halving_rate` of the agents go on to the next round. So agents that are clearly beaten
+    early don't run on the rest of the envs, and the most compute goes to the best agents.
+
+    The schedule, a row for each agent, is written to the output directory, see
+    `store.write_schedule`.
+
+    Args:
+      agent_suite: the agents to run
+      env_suites: the env suites to run the agents on, whose envs are taken in order
+      run_params: run parameters, see truman.run.interface.run
+      run_pairs: function running agent/env pairs with the run_params, writing their summaries
+
+    Returns:
+      the schedule; for each agent, its ID, the number of envs it ran, its mean score on them,
+      and the round it was pruned after, or None if it was never pruned
+    """
+    agent_specs = list(agent_suite.all())
+    env_specs = [env_spec for env_suite in env_suites for env_spec in env_suite.all()]
+    halving_rate = run_params.get("halving_rate", 2)
+
+    scores: Dict[str, List[float]] = {agent_spec.id: [] for agent_spec in agent_specs}
+    pruned_after: Dict[str, int] = {}
+    remaining = agent_specs
+    start = 0
+    for round_index, num_envs in enumerate(
+        round_sizes(len(agent_specs), len(env_specs), halving_rate)
+    ):
+        round_envs = env_specs[start : start + num_envs]
+        start += num_envs
+        run_pairs(
+            ((agent_spec, env_spec) for env_spec in round_envs for agent_spec in remaining),
+            run_params,
+        )
+        for env_spec in round_envs:
+            summaries = {
+                agent_spec.id: store.read_summary(agent_spec.id, env_spec.id, run_params)
+                for agent_spec in remaining
+            }
+            rewards = {agent_id: summary["avg_reward"] for agent_id, summary in summaries.items()}
+            for agent_id, score in _scores(rewards).items():
+                scores[agent_id].append(score)
+
+        if start == len(env_specs):
+            break
+        # Ranked by mean score, with ties kept in the agents' order
+        ranked = sorted(remaining, key=lambda spec: -_mean(scores[spec.id]))
+        num_kept = math.ceil(len(remaining) / halving_rate)
+        for agent_spec in ranked[num_kept:]:
+            pruned_after[agent_spec.id] = round_index
+        remaining = [agent_spec for agent_spec in remaining if agent_spec.id not in pruned_after]
+        logger.info(
+            f"Round {round_index} of successive halving ran {len(round_envs)} envs, pruning "
+            f"agents {[agent_spec.id for agent_spec in ranked[num_kept:]]}"
+        )
+
+    schedule = [
+        {
+            "agent_id": agent_spec.id,
+            "num_envs": len(scores[agent_spec.id]),
+            "score": _mean(scores[agent_spec.id]),
+            "pruned_after_round": pruned_after.get(agent_spec.id),
+        }
+        for agent_spec in agent_specs
+    ]
+    store.write_schedule(schedule, run_params)
+    return schedule
+
+
+def round_sizes(num_agents: int, num_envs: int, halving_rate: float) -> List[int]:
+    """The number of envs in each round of successive halving.
+
+    There's a round for each pruning of the agents to 1/halving_rate of them, down to a single
+    agent, and a final round, but no more rounds than envs. Each round has an env, and the rest
+    of the envs are split between the rounds in proportion to halving_rate to the round's power,
+    so the compute of each round is about the same.
+    """
+    num_rounds = 1
+    num_remaining = num_agents
+    while num_remaining > 1:
+        num_remaining = math.ceil(num_remaining / halving_rate)
+        num_rounds += 1
+    num_rounds = min(num_rounds, num_envs)
+
+    weights = [halving_rate**round_index for round_index in range(num_rounds)]
+    sizes = [1 + int((num_envs - num_rounds) * weight / sum(weights)) for weight in weights]
+    # The envs left over by rounding down go to the final round
+    if sizes:
+        sizes[-1] += num_envs - sum(sizes)
+    return sizes
+
+
+def _scores(rewards: Dict[str, float]) -> Dict[str, float]:
+    """Score each agent by the fraction of the other agents it beat, with ties as half a win."""
+    if len(rewards) == 1:
+        return {agent_id: 1.0 for agent_id in rewards}
+    return {
+        agent_id: sum(
+            1.0 if reward > other else 0.5 if reward == other else 0.0
+            for other_id, other in rewards.items()
+            if other_id != agent_id
+        )
+        / (len(rewards) - 1)
+        for agent_id, reward in rewards.items()
+    }
+
+
+def _mean(values: Sequence[float]) -> float:
+    return sum(values) / len(values) if values else float("nan")
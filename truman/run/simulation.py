@@ -1,31 +1,214 @@
 """Core loop to run a single agent on a single environment."""
-from typing import Tuple
-from truman.typing import Agent
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple, Union
+from truman.typing import Agent, BatchAgent
 
+import concurrent.futures
+import copy
+import multiprocessing
 import time
 
-import pandas as pd
-from gym import Env
-
 from truman import errors
-from truman import history as history_module
 
 
-def run(agent: Agent, env: Env, run_params: dict) -> Tuple[pd.DataFrame, float]:
+if TYPE_CHECKING:
+    import pandas as pd
+    from gym import Env
+    from gym.envs.registration import EnvSpec
+
+    from truman import history as history_module
+
+
+def run(
+    agent: Union[Agent, BatchAgent],
+    env: "Env",
+    run_params: dict,
+    history: Optional["history_module.History"] = None,
+) -> Tuple["pd.DataFrame", float]:
     """Run an agent on an environment for a single episode.
 
+    Batch agents (see truman.typing.BatchAgent) are run on a batch env by `run_batch`.
+
+    Args:
+      agent: the agent to run
+      env: the env to run the agent on
+      run_params: run parameters, see truman.run.interface.run
+      history: the history to record the run to, defaults to one made for the run_params
+
     Returns:
-      a tuple (dataframe of the full history, elapsed time in seconds)
+      a tuple (dataframe of the full history, elapsed time in seconds). If the run_params
+      `timing` is set, the history has the wall time of each step's agent.act and env.step calls
+      in seconds, in the "agent_seconds" and "env_seconds" columns. If the run_params `regret`
+      is set, the history has the expected regret of each step's action, see `oracle.add_regret`
     """
+    if isinstance(agent, BatchAgent):
+        if history is not None:
+            raise ValueError("Batch agents are run with a BatchHistory, not a given history.")
+        return run_batch(agent, env, run_params)
+
     obs = env.reset()
-    history = history_module.History()
+    if history is None:
+        history = _make_history(env, run_params)
     history.append(None, obs, None, None, None, None)
 
+    timed = run_params.get("timing") is not None
+    # Wall time in seconds of each step's agent.act and env.step calls, when timed
+    agent_secs: List[float] = []
+    env_secs: List[float] = []
+
     start_time = time.time()
 
     # Run the environment for a single "episode"
     for _ in range(run_params["max_iters"]):
-        action, agent_info = agent.act(obs)
+        if timed:
+            step_start = time.perf_counter()
+            action, agent_info = agent.act(obs)
+            agent_end = time.perf_counter()
+            obs, reward, done, env_info = env.step(action)
+            env_end = time.perf_counter()
+            agent_secs.append(agent_end - step_start)
+            env_secs.append(env_end - agent_end)
+        else:
+            action, agent_info = agent.act(obs)
+            obs, reward, done, env_info = env.step(action)
+        history.append(action, obs, reward, done, env_info, agent_info)
+        if done:
+            elapsed_secs = time.time() - start_time
+            history_df = history.to_df()
+            if timed:
+                # The first row is the initial observation, which has no step
+                history_df["agent_seconds"] = [float("nan")] + agent_secs
+                history_df["env_seconds"] = [float("nan")] + env_secs
+            if run_params.get("regret"):
+                from truman import oracle
+
+                oracle.add_regret(history_df, env)
+            return history_df, elapsed_secs
+
+    raise errors.StoppedEarly("Environment did not finish within max iterations.")
+
+
+def run_batch(agent: BatchAgent, env: "Env", run_params: dict) -> Tuple["pd.DataFrame", float]:
+    """Run a batch agent on a batch of env replicas, stepped together, for a single episode.
+
+    Each step, the agent acts on the observations of every replica in a single call, and the
+    env steps every replica in a single call, e.g. DiscreteStrategyBinomialBatch. The episode
+    runs until every replica is done.
+
+    Args:
+      agent: the batch agent to run, e.g. a truman.batch_agent.BatchedAgent of scalar agents
+      env: the batch env to run the agent on
+      run_params: run parameters, see truman.run.interface.run. `timing` and `regret` aren't
+        supported
+
+    Returns:
+      a tuple (dataframe of the full history of every replica, see BatchHistory.to_df, elapsed
+      time in seconds)
+    """
+    import numpy as np
+
+    from truman import history as history_module
+
+    for param in ["timing", "regret"]:
+        if run_params.get(param):
+            raise ValueError(f"Run parameter {param} isn't supported by batch runs.")
+
+    observations = env.reset()
+    history = history_module.BatchHistory()
+    history.append(None, observations, None, None, None, None)
+
+    start_time = time.time()
+
+    for _ in range(run_params["max_iters"]):
+        actions, agent_info = agent.act_batch(observations)
+        observations, rewards, dones, env_info = env.step(actions)
+        history.append(actions, observations, rewards, dones, env_info, agent_info)
+        if np.all(dones):
+            elapsed_secs = time.time() - start_time
+            return history.to_df(), elapsed_secs
+
+    raise errors.StoppedEarly("Environment did not finish within max iterations.")
+
+
+def run_branches(
+    agent: Agent, env: "Env", run_params: dict, observation: Any, actions: Sequence
+) -> List[Tuple["pd.DataFrame", float]]:
+    """Run counterfactual branches of an episode from the env's current state, to its end.
+
+    The env's state is snapshotted by its `get_state`, and each branch restores it by
+    `set_state`, rather than replaying the episode up to it. Each branch runs a copy of the agent
+    as it is, and takes the branch's action in its first step, in place of the agent's. From
+    there, the agent acts as usual. The env is restored to the snapshot once the branches are run.
+
+    Args:
+      agent: the agent to branch, as it is at the env's current state
+      env: the env to branch, which has `get_state` and `set_state`
+      run_params: run parameters, see truman.run.interface.run. If `workers` is set, the
+        branches are run in parallel worker processes, which make the env from its spec, so the
+        agent, the env's spec, and its state must be picklable. `timing` and `regret` aren't
+        supported
+      observation: the env's last observation, the first row of each branch's history
+      actions: the first action of each branch, e.g. every strategy of the env
+
+    Returns:
+      a list of tuples (dataframe of the branch's history, elapsed time in seconds), one for
+      each action
+    """
+    for param in ["timing", "regret"]:
+        if run_params.get(param):
+            raise ValueError(f"Run parameter {param} isn't supported by branch runs.")
+
+    state = env.unwrapped.get_state()
+    workers = run_params.get("workers")
+    if workers is None:
+        try:
+            return [
+                _run_branch(copy.deepcopy(agent), env, state, observation, action, run_params)
+                for action in actions
+            ]
+        finally:
+            env.unwrapped.set_state(state)
+
+    spec = env.unwrapped.spec
+    if spec is None:
+        raise ValueError(
+            "Branches are run in parallel on envs made from their spec, but env has none."
+        )
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=context
+    ) as executor:
+        futures = [
+            executor.submit(_run_spec_branch, agent, spec, state, observation, action, run_params)
+            for action in actions
+        ]
+        return [future.result() for future in futures]
+
+
+def _run_spec_branch(
+    agent: Agent,
+    env_spec: "EnvSpec",
+    state: dict,
+    observation: Any,
+    action: Any,
+    run_params: dict,
+) -> Tuple["pd.DataFrame", float]:
+    return _run_branch(agent, env_spec.make(), state, observation, action, run_params)
+
+
+def _run_branch(
+    agent: Agent, env: "Env", state: dict, observation: Any, action: Any, run_params: dict
+) -> Tuple["pd.DataFrame", float]:
+    env.unwrapped.set_state(state)
+    history = _make_history(env, run_params)
+    history.append(None, observation, None, None, None, None)
+
+    start_time = time.time()
+
+    # The branch's first action is given rather than the agent's, so has no agent info
+    obs, agent_info = observation, None
+    for i in range(run_params["max_iters"]):
+        if i > 0:
+            action, agent_info = agent.act(obs)
         obs, reward, done, env_info = env.step(action)
         history.append(action, obs, reward, done, env_info, agent_info)
         if done:
@@ -33,3 +216,13 @@ def run(agent: Agent, env: Env, run_params: dict) -> Tuple[pd.DataFrame, float]:
             return history.to_df(), elapsed_secs
 
     raise errors.StoppedEarly("Environment did not finish within max iterations.")
+
+
+def _make_history(env: "Env", run_params: dict) -> "history_module.History":
+    from truman import history as history_module
+
+    if run_params.get("history_backend", "list") == "columnar":
+        return history_module.ColumnarHistory(
+            env.observation_space, env.action_space, capacity=run_params["max_iters"] + 1
+        )
+    return history_module.History()
@@ -1,29 +1,404 @@
-"""Utilities for summarising and storing results of simulation runs."""
-import os.path
+"""Utilities for summarising and storing results of simulation runs.
 
-import pandas as pd
+numpy, pandas and pyarrow are imported where they're used, so importing truman stays cheap.
+"""
+from typing import IO, TYPE_CHECKING, Callable, List, Optional, Tuple
+
+import logging
+import os
+import queue
+import threading
+import urllib.parse
+
+from truman import errors
+
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    from truman import history as history_module
+
+
+logger = logging.getLogger(__name__)
 
 
 def summarise(
-    history: pd.DataFrame, elapsed_time: float, agent_id: str, env_id: str, run_params: dict
+    history: "pd.DataFrame", elapsed_time: float, agent_id: str, env_id: str, run_params: dict
 ) -> dict:
-    """Summarise the history into a single row."""
-    return {
+    """Summarise the history into a single row.
+
+    If the history has step timing columns (see `simulation.run`), the summary includes the
+    total and percentiles of the agent and env times. If it has expected regret columns (see
+    `oracle.add_regret`), the summary includes the cumulative expected regret of the episode.
+
+    The history of a batch run (see `simulation.run_batch`) is summarised over all its
+    replicas, with the number of steps of each replica, and the number of replicas.
+    """
+    import numpy as np
+
+    num_replicas = history["replica"].nunique() if "replica" in history else 1
+    summary = {
         "avg_reward": history["reward"].mean(),
-        "num_steps": len(history) - 1,
+        "num_steps": len(history) // num_replicas - 1,
         "time_seconds": elapsed_time,
         "agent_id": agent_id,
         "env_id": env_id,
     }
+    for name in ["agent", "env"]:
+        if f"{name}_seconds" in history:
+            step_seconds = history[f"{name}_seconds"].iloc[1:].to_numpy()
+            summary[f"{name}_time_seconds"] = step_seconds.sum()
+            for percentile, value in zip(
+                TIMING_PERCENTILES, np.percentile(step_seconds, TIMING_PERCENTILES)
+            ):
+                summary[f"{name}_step_seconds_p{percentile}"] = value
+    if "expected_regret" in history:
+        summary["cumulative_expected_regret"] = history["expected_regret"].iloc[1:].sum()
+    if "replica" in history:
+        summary["num_replicas"] = num_replicas
+    return summary
 
 
-def write(history: pd.DataFrame, summary: dict, agent_id: str, env_id: str, run_params: dict):
-    """Write the history and summary to individual files in the run_params output directory."""
-    write_base_fp = os.path.join(
-        run_params["output_directory"], f"agent_id={agent_id}__env_id={env_id}"
-    )
-    with open(f"{write_base_fp}.parquet", "wb") as history_fh:
-        history.to_parquet(history_fh)
-    with open(f"{write_base_fp}__summary.csv", "w") as summary_fh:
+def aggregate(summaries: List[dict], agent_id: str, env_id: str) -> dict:
+    """Aggregate the summaries of replicate runs of an agent/env pair into a single row.
+
+    Numeric stats are averaged over the replicates, except `time_seconds`, which is totalled.
+    The summary also has the standard deviation and a 95% confidence interval of the mean of
+    `avg_reward`, and of `cumulative_expected_regret` if summarised. The intervals use Student's
+    t distribution, as there are usually few replicates.
+    """
+    import numpy as np
+    import pandas as pd
+    from scipy import stats as scipy_stats
+
+    replicates = pd.DataFrame(summaries).drop(columns=PARTITION_COLUMNS, errors="ignore")
+    summary = replicates.mean(numeric_only=True).to_dict()
+    summary["time_seconds"] = replicates["time_seconds"].sum()
+
+    num_replicates = len(replicates)
+    stats = [stat for stat in CONFIDENCE_STATS if stat in replicates]
+    values = replicates[stats].to_numpy(dtype=float)
+    if num_replicates > 1:
+        stds = values.std(axis=0, ddof=1)
+        quantile = scipy_stats.t.ppf(0.5 + CONFIDENCE_LEVEL / 2, num_replicates - 1)
+    else:
+        stds = np.full(len(stats), np.nan)
+        quantile = np.nan
+    half_widths = quantile * stds / np.sqrt(num_replicates)
+    for stat, std, half_width in zip(stats, stds, half_widths):
+        summary[f"{stat}_std"] = std
+        summary[f"{stat}_ci_low"] = summary[stat] - half_width
+        summary[f"{stat}_ci_high"] = summary[stat] + half_width
+    summary.update({"num_replicates": num_replicates, "agent_id": agent_id, "env_id": env_id})
+    return summary
+
+
+TIMING_PERCENTILES = [50, 90, 99]
+TIMING_COLUMNS = ["agent_seconds", "env_seconds"]
+PARTITION_COLUMNS = ["agent_id", "env_id"]
+# Stats with confidence intervals in aggregated summaries, and the intervals' confidence level
+CONFIDENCE_STATS = ["avg_reward", "cumulative_expected_regret"]
+CONFIDENCE_LEVEL = 0.95
+
+
+def write(history: "pd.DataFrame", summary: dict, agent_id: str, env_id: str, run_params: dict):
+    """Write the history and summary of a run to the run_params output directory.
+
+    With the default `output_format` "files", the history and summary are written to individual
+    files named by the agent and env IDs. With `output_format` "dataset", they are written to
+    the `history` and `summary` parquet datasets, partitioned by agent and env ID.
+
+    Each file is written to a temporary path and then renamed, so a file at the final path is
+    always complete. The summary is written last, marking the pair as complete.
+
+    When streaming (see `open_history`), the history has already been written to its temporary
+    path during the run, and only needs renaming; the given history dataframe isn't written.
+    A ValueError is raised if no history was streamed to the temporary path.
+
+    Step timing columns are dropped from the history when the run_params `timing` is "summary".
+    """
+    write_history(history, agent_id, env_id, run_params)
+    write_summary(summary, agent_id, env_id, run_params)
+
+
+def write_history(
+    history: "pd.DataFrame",
+    agent_id: str,
+    env_id: str,
+    run_params: dict,
+    replicate: Optional[int] = None,
+):
+    """Write the history of a run, or of one replicate run of the pair, see `write`."""
+    if run_params.get("timing") == "summary":
+        history = history.drop(columns=TIMING_COLUMNS, errors="ignore")
+    history_fp = _history_fp(agent_id, env_id, run_params, replicate)
+    if _is_dataset(run_params):
+        os.makedirs(os.path.dirname(history_fp), exist_ok=True)
+
+    if run_params.get("stream_row_group_size"):
+        if not os.path.exists(_tmp_fp(history_fp)):
+            raise ValueError(
+                f"No history was streamed to {_tmp_fp(history_fp)}, though "
+                "stream_row_group_size is set; stream it to the history opened by open_history"
+            )
+        os.replace(_tmp_fp(history_fp), history_fp)
+    else:
+        _write_atomic(history_fp, "wb", history.to_parquet)
+
+
+def write_summary(summary: dict, agent_id: str, env_id: str, run_params: dict):
+    """Write the summary of a pair, marking it as complete, see `write`."""
+    import pandas as pd
+
+    summary_fp = _summary_fp(agent_id, env_id, run_params)
+    if _is_dataset(run_params):
+        os.makedirs(os.path.dirname(summary_fp), exist_ok=True)
+        # The IDs are given by the partitioning
+        summary_df = pd.DataFrame(
+            [{key: value for key, value in summary.items() if key not in PARTITION_COLUMNS}]
+        )
+        _write_atomic(summary_fp, "wb", lambda fh: summary_df.to_parquet(fh, index=False))
+    else:
         # Convert the summary dict into a single row CSV
-        pd.Series(summary).to_frame().T.to_csv(summary_fh, index=False)
+        summary_df = pd.Series(summary).to_frame().T
+        _write_atomic(summary_fp, "w", lambda fh: summary_df.to_csv(fh, index=False))
+
+
+class BackgroundWriter:
+    """Writes the histories and summaries of runs (see `write`) on a background thread.
+
+    Writes are queued, and each write blocks while `queue_size` writes are already waiting. The
+    history and summary of a run are queued as a single write, so `queue_size` is the number of
+    completed runs that may wait to be written. A write that fails doesn't stop the writes queued
+    after it, except the pair's summary, so the pair isn't marked complete; RunFailed is raised
+    by `close` once all queued writes are done.
+
+    Use as a context manager, which closes the writer on exit.
+    """
+
+    def __init__(self, queue_size: int):
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._failed: List[Tuple[str, str]] = []
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def write(
+        self, history: "pd.DataFrame", summary: dict, agent_id: str, env_id: str, run_params: dict
+    ):
+        """Queue the history and summary to be written, see `write`."""
+        self._put(agent_id, env_id, write, (history, summary, agent_id, env_id, run_params))
+
+    def write_history(
+        self,
+        history: "pd.DataFrame",
+        agent_id: str,
+        env_id: str,
+        run_params: dict,
+        replicate: Optional[int] = None,
+    ):
+        """Queue the history to be written, see `write_history`."""
+        self._put(
+            agent_id, env_id, write_history, (history, agent_id, env_id, run_params, replicate)
+        )
+
+    def write_summary(self, summary: dict, agent_id: str, env_id: str, run_params: dict):
+        """Queue the summary to be written, see `write_summary`."""
+        self._put(agent_id, env_id, write_summary, (summary, agent_id, env_id, run_params))
+
+    def close(self):
+        """Wait for all queued writes to be written."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._failed:
+            raise errors.RunFailed(f"{len(self._failed)} writes failed: {sorted(self._failed)}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Let the queued writes finish, but don't hide the original error
+            self._queue.put(None)
+            self._thread.join()
+
+    def _put(self, agent_id: str, env_id: str, write_func: Callable, args: tuple):
+        self._queue.put((agent_id, env_id, write_func, args))
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            agent_id, env_id, write_func, args = item
+            if (agent_id, env_id) in self._failed:
+                continue
+            try:
+                write_func(*args)
+            except Exception as error:
+                logger.error(f"Write failed for agent {agent_id} on env {env_id}: {error!r}")
+                self._failed.append((agent_id, env_id))
+
+
+def consolidate(run_params: dict):
+    """Consolidate the summaries of a "dataset" output_format run into a single table.
+
+    The table is written to `summary.parquet` in the output directory. The summary of each pair
+    in the `summary` dataset is kept, as it marks the pair as complete to `resume`, and is read
+    by the successive halving scheduler. Does nothing for other output formats.
+    """
+    if not _is_dataset(run_params):
+        return
+    import pyarrow.parquet as pq
+
+    summaries = dataset(run_params["output_directory"], "summary").to_table()
+    summary_fp = os.path.join(run_params["output_directory"], "summary.parquet")
+    _write_atomic(summary_fp, "wb", lambda fh: pq.write_table(summaries, fh))
+
+
+def dataset(output_directory: str, name: str = "history") -> "ds.Dataset":
+    """Open the "history" or "summary" dataset written by a "dataset" output_format run.
+
+    The agent_id and env_id partition columns can be used to filter scans of the dataset
+    without opening the files of other agents and envs. Their values are URI decoded from the
+    partition directory names (as of pyarrow 6). Histories of replicated runs are further
+    partitioned by replicate, in the replicate column, which is null for runs that weren't
+    replicated.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    fields = [(column, pa.string()) for column in PARTITION_COLUMNS]
+    if name == "history":
+        fields.append(("replicate", pa.int64()))
+    partitioning = ds.HivePartitioning(pa.schema(fields), segment_encoding="uri")
+    return ds.dataset(
+        os.path.join(output_directory, name), format="parquet", partitioning=partitioning
+    )
+
+
+def open_history(
+    agent_id: str, env_id: str, run_params: dict, replicate: Optional[int] = None
+) -> Optional["history_module.StreamingHistory"]:
+    """Open a history that streams to the pair's output, if the run_params ask for streaming.
+
+    Returns:
+        a StreamingHistory when `stream_row_group_size` is set, otherwise None
+    """
+    row_group_size = run_params.get("stream_row_group_size")
+    if not row_group_size:
+        return None
+    from truman import history as history_module
+
+    history_fp = _history_fp(agent_id, env_id, run_params, replicate)
+    if _is_dataset(run_params):
+        os.makedirs(os.path.dirname(history_fp), exist_ok=True)
+    return history_module.StreamingHistory(_tmp_fp(history_fp), row_group_size)
+
+
+def is_complete(agent_id: str, env_id: str, run_params: dict) -> bool:
+    """Whether valid histories and a summary have been written for the agent/env pair.
+
+    When the run_params `num_replicates` is more than 1, every replicate's history is checked.
+    """
+    import pyarrow.parquet as pq
+
+    try:
+        for replicate in replicates(run_params):
+            pq.read_metadata(_history_fp(agent_id, env_id, run_params, replicate))
+        summary = _read_summary_df(agent_id, env_id, run_params)
+    except (OSError, ValueError):
+        # Missing files raise OSErrors, unreadable files raise ValueErrors
+        return False
+    return len(summary) == 1
+
+
+def read_summary(agent_id: str, env_id: str, run_params: dict) -> dict:
+    """Read the summary written for the agent/env pair, see `write_summary`."""
+    return _read_summary_df(agent_id, env_id, run_params).iloc[0].to_dict()
+
+
+def write_schedule(schedule: List[dict], run_params: dict):
+    """Write the record of a scheduled run's agents to the output directory, one row per agent.
+
+    Written to `schedule.csv`, or `schedule.parquet` with the "dataset" output_format.
+    """
+    import pandas as pd
+
+    schedule_df = pd.DataFrame(schedule)
+    if _is_dataset(run_params):
+        schedule_fp = os.path.join(run_params["output_directory"], "schedule.parquet")
+        _write_atomic(schedule_fp, "wb", lambda fh: schedule_df.to_parquet(fh, index=False))
+    else:
+        schedule_fp = os.path.join(run_params["output_directory"], "schedule.csv")
+        _write_atomic(schedule_fp, "w", lambda fh: schedule_df.to_csv(fh, index=False))
+
+
+def replicates(run_params: dict) -> List[Optional[int]]:
+    """The replicate indices of the runs of each pair; [None] for a single, unreplicated run."""
+    num_replicates = run_params.get("num_replicates", 1)
+    if num_replicates == 1:
+        return [None]
+    return list(range(num_replicates))
+
+
+def _is_dataset(run_params: dict) -> bool:
+    return run_params.get("output_format", "files") == "dataset"
+
+
+def _read_summary_df(agent_id: str, env_id: str, run_params: dict) -> "pd.DataFrame":
+    import pandas as pd
+
+    summary_fp = _summary_fp(agent_id, env_id, run_params)
+    if _is_dataset(run_params):
+        return pd.read_parquet(summary_fp)
+    return pd.read_csv(summary_fp)
+
+
+def _history_fp(
+    agent_id: str, env_id: str, run_params: dict, replicate: Optional[int] = None
+) -> str:
+    if _is_dataset(run_params):
+        partition_dir = _partition_dir("history", agent_id, env_id, run_params)
+        if replicate is not None:
+            partition_dir = os.path.join(partition_dir, f"replicate={replicate}")
+        return os.path.join(partition_dir, "part-0.parquet")
+    replicate_suffix = "" if replicate is None else f"__replicate={replicate}"
+    return f"{_write_base_fp(agent_id, env_id, run_params)}{replicate_suffix}.parquet"
+
+
+def _summary_fp(agent_id: str, env_id: str, run_params: dict) -> str:
+    if _is_dataset(run_params):
+        return os.path.join(
+            _partition_dir("summary", agent_id, env_id, run_params), "part-0.parquet"
+        )
+    return f"{_write_base_fp(agent_id, env_id, run_params)}__summary.csv"
+
+
+def _partition_dir(name: str, agent_id: str, env_id: str, run_params: dict) -> str:
+    # Quoted, since IDs may contain a username and a slash
+    return os.path.join(
+        run_params["output_directory"],
+        name,
+        f"agent_id={urllib.parse.quote(agent_id, safe=':')}",
+        f"env_id={urllib.parse.quote(env_id, safe=':')}",
+    )
+
+
+def _write_base_fp(agent_id: str, env_id: str, run_params: dict) -> str:
+    return os.path.join(run_params["output_directory"], f"agent_id={agent_id}__env_id={env_id}")
+
+
+def _tmp_fp(fp: str) -> str:
+    # Hidden, so incomplete files are ignored when discovering the files of a dataset
+    directory, filename = os.path.split(fp)
+    return os.path.join(directory, f".{filename}.tmp")
+
+
+def _write_atomic(fp: str, mode: str, write_func: Callable[[IO], None]):
+    tmp_fp = _tmp_fp(fp)
+    with open(tmp_fp, mode) as fh:
+        write_func(fh)
+    os.replace(tmp_fp, fp)
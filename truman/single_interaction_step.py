@@ -1,12 +1,104 @@
 """Contains envs which have an interaction with a single entity (e.g. bandit) for each step."""
 
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Optional, Sequence
 from typing_extensions import Protocol
-from truman.typing import StepReturn
+from truman.typing import BatchStepReturn, StepReturn
+
+import copy
 
 import gym
 import numpy as np
 
+from truman import registry
+
+
+class TrajectoryBuffer:
+    """The values of a trajectory, generated in chunks and served in order.
+
+    Generating a chunk of values at once, vectorised, is far faster than generating each value
+    separately. The values are the same whether they're taken one at a time or many at once.
+
+    Args:
+        generate: function returning the next given number of values of the trajectory
+        chunk_size: number of values generated at a time
+    """
+
+    def __init__(self, generate: Callable[[int], np.ndarray], chunk_size: int):
+        self.generate = generate
+        self.chunk_size = chunk_size
+        self.clear()
+
+    def clear(self):
+        """Discard the values already generated."""
+        self._set_chunk(np.empty(0), 0)
+
+    def next(self) -> float:
+        """Return the next value."""
+        if self._position == len(self._values):
+            self._set_chunk(self.generate(self.chunk_size), 0)
+        value = self._values[self._position]
+        self._position += 1
+        return value
+
+    def take(self, n: int) -> np.ndarray:
+        """Return the next n values."""
+        start = self._position
+        if start + n <= len(self._chunk):
+            self._position += n
+            return self._chunk[start : self._position]
+
+        # Take the rest of the chunk, and the remainder from new chunks
+        remainder = n - (len(self._chunk) - start)
+        num_chunks = -(-remainder // self.chunk_size)
+        rest = self._chunk[start:]
+        self._set_chunk(self.generate(num_chunks * self.chunk_size), remainder)
+        return np.concatenate([rest, self._chunk[:remainder]])
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the values generated and the position in them."""
+        return {"chunk": self._chunk, "position": self._position}
+
+    def set_state(self, state: dict):
+        """Restore a snapshot of `get_state`."""
+        self._set_chunk(state["chunk"], state["position"])
+
+    def _set_chunk(self, chunk: np.ndarray, position: int):
+        self._chunk = chunk
+        # Single values are much faster to take from a list, as python floats
+        self._values = chunk.tolist()
+        self._position = position
+
+
+class UniformBuffer(TrajectoryBuffer):
+    """Uniform random numbers in [0, 1), drawn from a seeded numpy Generator in blocks.
+
+    Args:
+        block_size: number of random numbers drawn at a time
+        seed: seed of the Generator
+    """
+
+    def __init__(self, block_size: int = 4096, seed: Optional[int] = None):
+        super().__init__(self._draw, block_size)
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None):
+        """Seed the Generator, discarding the numbers already drawn."""
+        self.rng = np.random.default_rng(seed)
+        self.clear()
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the numbers drawn, the position in them, and the random state."""
+        return {**super().get_state(), "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        """Restore a snapshot of `get_state`."""
+        super().set_state(state)
+        self.rng.bit_generator.state = state["rng"]
+
+    def _draw(self, num_values: int) -> np.ndarray:
+        # A bound method, rather than a closure, so copies of the buffer draw from their own rng
+        return self.rng.random(num_values)
+
 
 class Bandit:
     """A bandit implementation - like a slot machine with a fixed conversion rate."""
@@ -14,57 +106,211 @@ class Bandit:
     def __init__(self, conversion_rate: float):
         self.conversion_rate = conversion_rate
 
-    def action(self, multiplier: float = 1.0) -> bool:
-        """Use rand to see if success based on bandit's conversion rate."""
+    def action(self, multiplier: float = 1.0, uniform: Optional[float] = None) -> bool:
+        """Use rand to see if success based on bandit's conversion rate.
+
+        Args:
+            multiplier: multiplier of the conversion rate
+            uniform: uniform random number in [0, 1) deciding the success, e.g. from an env's
+                UniformBuffer, defaults to one drawn from the global numpy random state
+        """
         conversion_rate = min(self.conversion_rate * multiplier, 1)
-        # TODO set random seeding etc
-        return np.random.random() < conversion_rate
+        if uniform is None:
+            uniform = np.random.random()
+        return uniform < conversion_rate
+
+
+def _conversions(bandits: List[Bandit], selected_bandits, multipliers, uniforms) -> np.ndarray:
+    """Decide the successes of many pulls of the bandits at once, as Bandit.action does each."""
+    conversion_rates = np.array([bandit.conversion_rate for bandit in bandits])
+    return uniforms < np.minimum(conversion_rates[selected_bandits] * multipliers, 1)
+
 
+def _read_only_observation(conversion: int) -> np.ndarray:
+    observation = np.array([conversion], dtype=np.int8)
+    observation.flags.writeable = False
+    return observation
 
-class BasicDiscreteBernoulliBandits(gym.Env):
+
+# Observations of no conversion and conversion, shared read-only so steps needn't make arrays
+_OBSERVATIONS = (_read_only_observation(0), _read_only_observation(1))
+
+
+def _batch_step_return(conversions: np.ndarray, dones: np.ndarray) -> BatchStepReturn:
+    observations = conversions.astype(np.int8)[:, np.newaxis]
+    return observations, conversions.astype(float), dones, {}
+
+
+class _BernoulliBanditsEnv(gym.Env):
+    """Base of the envs of bandits, handling their episodes, seeding and cloning.
+
+    Observations are whether the selected bandit converted, as an array of shape (1,).
+
+    Args:
+        action_space: the env's action space
+        episode_length: number of steps in an episode, or None for episodes that never end
+    """
+
+    def __init__(self, action_space: gym.Space, episode_length: Optional[int] = None):
+        self.action_space = action_space
+        self.observation_space = gym.spaces.MultiBinary(1)
+        self.episode_length = episode_length
+
+        self.timestep = 0
+        self.uniforms = UniformBuffer()
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """Reset env, optionally reseeding it."""
+        if seed is not None:
+            self.seed(seed)
+        self.timestep = 0
+        return np.zeros(1, dtype=np.int8)
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """Seed the env's random number generator."""
+        self.uniforms.seed(seed)
+        return [seed]
+
+    def clone(self):
+        """Return an independent copy of the env, continuing from its current state.
+
+        The copy has its own random state, so it draws the same responses as the env would.
+        """
+        return copy.deepcopy(self)
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the env's timestep and random state, to restore by `set_state`."""
+        return {"timestep": self.timestep, "uniforms": self.uniforms.get_state()}
+
+    def set_state(self, state: dict):
+        """Restore the env to a snapshot of `get_state`.
+
+        A snapshot can be restored any number of times, e.g. to branch many rollouts from it,
+        without replaying the episode up to it.
+        """
+        self.timestep = state["timestep"]
+        self.uniforms.set_state(state["uniforms"])
+
+    def _next_timestep(self) -> bool:
+        """Advance a timestep, returning whether the episode is done."""
+        if self.episode_length is None:
+            self.timestep += 1
+            return False
+        if self.timestep >= self.episode_length:
+            raise gym.error.ResetNeeded("Environment needs resetting before use.")
+        self.timestep += 1
+        return self.timestep >= self.episode_length
+
+    def _next_timesteps(self, num_steps: int) -> np.ndarray:
+        """Advance num_steps timesteps, returning whether the episode is done after each."""
+        start = self.timestep
+        if self.episode_length is None:
+            self.timestep += num_steps
+            return np.zeros(num_steps, dtype=bool)
+        if start + num_steps > self.episode_length:
+            raise gym.error.ResetNeeded(
+                f"Can't take {num_steps} steps, the episode ends in {self.episode_length - start}."
+            )
+        self.timestep += num_steps
+        return np.arange(start + 1, self.timestep + 1) >= self.episode_length
+
+
+class BasicDiscreteBernoulliBandits(_BernoulliBanditsEnv):
     """Env of N bandits who each have a static conversion rate."""
 
-    def __init__(self, bandits: List[Bandit]):
+    def __init__(self, bandits: List[Bandit], episode_length: Optional[int] = None):
+        super().__init__(gym.spaces.Discrete(len(bandits)), episode_length)
         self.bandits = bandits
 
-        self.action_space = gym.spaces.Discrete(len(bandits))
-        self.observation_space = gym.spaces.Discrete(1)
-
     def step(self, selected_bandit: int) -> StepReturn:
         """Select bandit and receive response."""
         assert self.action_space.contains(selected_bandit)
-        observation = self.bandits[selected_bandit].action()
-        reward = float(observation)
-        return observation, reward, False, {}
+        done = self._next_timestep()
+        conversion = self.bandits[selected_bandit].action(uniform=self.uniforms.next())
+        return _OBSERVATIONS[conversion], float(conversion), done, {}
+
+    def step_many(self, selected_bandits: np.ndarray) -> BatchStepReturn:
+        """Select a bandit at each of many steps, and receive their responses at once.
+
+        Equivalent to calling `step` with each of the selected bandits in turn.
+
+        Returns:
+            tuple of (observations, rewards, dones, info), each array of length of the steps
+        """
+        selected_bandits = np.asarray(selected_bandits)
+        assert ((0 <= selected_bandits) & (selected_bandits < len(self.bandits))).all()
+        dones = self._next_timesteps(len(selected_bandits))
+        uniforms = self.uniforms.take(len(selected_bandits))
+        return _batch_step_return(
+            _conversions(self.bandits, selected_bandits, 1.0, uniforms), dones
+        )
+
 
+class HeirarchicalStaticBernoulliBandits(_BernoulliBanditsEnv):
+    """Env of N bandits whose conversion rates are modified by a context.
 
-class HeirarchicalStaticBernoulliBandits(gym.Env):
-    """Env of N bandits whose conversion rates are modified by a context."""
+    As the contexts are static, the conversion rate of every bandit in every combination of
+    contexts is computed once, on construction, from the bandits' conversion rates at the time.
+    """
 
-    def __init__(self, bandits: List[Bandit], context: Dict[str, Dict[str, float]]):
+    def __init__(
+        self,
+        bandits: List[Bandit],
+        context: Dict[str, Dict[str, float]],
+        episode_length: Optional[int] = None,
+    ):
         self.bandits = bandits
         self.context_keys = {key: list(value.keys()) for key, value in context.items()}
         self.context = [list(value.values()) for value in context.values()]
-
-        self.action_space = gym.spaces.MultiDiscrete(
-            [len(bandits)] + [len(c) for c in self.context]
+        super().__init__(
+            gym.spaces.MultiDiscrete([len(bandits)] + [len(c) for c in self.context]),
+            episode_length,
         )
-        self.observation_space = gym.spaces.Discrete(1)
+
+        # Conversion rates of shape (number of bandits, size of each context dimension, ...)
+        conversion_rates = np.array([bandit.conversion_rate for bandit in bandits], dtype=float)
+        for dimension in self.context:
+            conversion_rates = np.multiply.outer(conversion_rates, np.array(dimension, float))
+        self.conversion_rates = np.minimum(conversion_rates, 1)
+        self.conversion_rates.flags.writeable = False
 
     def step(self, action: List[int]) -> StepReturn:
         """Select bandit and receive response."""
         assert self.action_space.contains(action)
-        selected_bandit = action[0]
-        context_multiplier = 1.0
-        for dim_action, dimension in zip(action[1:], self.context):
-            context_multiplier *= dimension[dim_action]
-        observation = self.bandits[selected_bandit].action(multiplier=context_multiplier)
-        reward = float(observation)
-        return observation, reward, False, {}
+        done = self._next_timestep()
+        conversion = bool(self.uniforms.next() < self.conversion_rates[tuple(action)])
+        return _OBSERVATIONS[conversion], float(conversion), done, {}
+
+    def step_many(self, actions: np.ndarray) -> BatchStepReturn:
+        """Select a bandit and context at each of many steps, and receive the responses at once.
+
+        Equivalent to calling `step` with each of the actions in turn.
+
+        Args:
+            actions: array of shape (num_steps, 1 + number of contexts) of the actions
+
+        Returns:
+            tuple of (observations, rewards, dones, info), each array of length of the steps
+        """
+        actions = np.asarray(actions)
+        assert actions.ndim == 2 and actions.shape[1] == len(self.action_space.nvec)
+        assert ((0 <= actions) & (actions < self.action_space.nvec)).all()
+        dones = self._next_timesteps(len(actions))
+        conversion_rates = self.conversion_rates[tuple(actions.T)]
+        return _batch_step_return(self.uniforms.take(len(actions)) < conversion_rates, dones)
 
 
 class StepperModifier(Protocol):
-    """Protocol defining context modifier that can change per step."""
+    """Protocol defining context modifier that can change per step.
+
+    Modifiers may also define:
+        `trajectory(num_steps) -> np.ndarray`, returning the next num_steps modifiers at once, as
+            if `step` were called num_steps times
+        `reset()`, restarting the modifiers from the first step, called when their env is reset
+        `seed(seed)`, seeding their own random number generator, called when their env is seeded
+        `get_state() -> dict` and `set_state(state)`, snapshotting and restoring their state, used
+            by their env's; modifiers without them are snapshotted by deep copy
+    """
 
     def step(self) -> float:
         """Return next context modifier."""
@@ -74,7 +320,8 @@ class StepperModifier(Protocol):
 def weekly_periodicity(modifiers: List[float]) -> Callable[[int], float]:
     """A utility wrapper for creating a weekly periodicity.
 
-    This also serves as an example of how to write a periodicity function.
+    This also serves as an example of how to write a periodicity function. Its `period` is
+    set, so a Periodicity of it can tile a week of modifiers.
     """
     if len(modifiers) != 7:
         raise ValueError("There's 7 days in a week, so `modifier` must be of length 7.")
@@ -83,15 +330,37 @@ def weekly_periodicity(modifiers: List[float]) -> Callable[[int], float]:
         day_of_week = timestep % 7
         return float(modifiers[day_of_week])
 
+    _periodicity.period = 7  # type: ignore
     return _periodicity
 
 
 class Periodicity:
-    """A periodic modifier."""
+    """A periodic modifier.
+
+    Args:
+        periodicity: function of the timestep returning the modifier
+        period: number of timesteps after which the modifiers repeat, defaults to the `period`
+            attribute of the periodicity function, if any. Trajectories of modifiers with a period
+            are tiled from a single period.
+    """
 
-    def __init__(self, periodicity: Callable[[int], float]):
+    def __init__(self, periodicity: Callable[[int], float], period: Optional[int] = None):
         self.timestep = 0
         self.periodicity = periodicity
+        self.period = getattr(periodicity, "period", None) if period is None else period
+        self._cycle: Optional[np.ndarray] = None
+
+    def reset(self):
+        """Restart the modifiers from the first timestep."""
+        self.timestep = 0
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the modifier's timestep."""
+        return {"timestep": self.timestep}
+
+    def set_state(self, state: dict):
+        """Restore a snapshot of `get_state`."""
+        self.timestep = state["timestep"]
 
     def step(self) -> float:
         """Return next modifier."""
@@ -99,51 +368,223 @@ class Periodicity:
         self.timestep += 1
         return multiplier
 
+    def trajectory(self, num_steps: int) -> np.ndarray:
+        """Return the next num_steps modifiers."""
+        start = self.timestep
+        self.timestep += num_steps
+        if self.period is None:
+            return np.array([self.periodicity(t) for t in range(start, self.timestep)], float)
+        if self._cycle is None:
+            self._cycle = np.array([self.periodicity(t) for t in range(self.period)], float)
+        return self._cycle[np.arange(start, self.timestep) % self.period]
+
 
 class RandomWalkTrend:
-    """A modifier which random walks within bounds."""
+    """A modifier which random walks within bounds, starting from 1.
+
+    Args:
+        lower: lower bound of the modifier
+        upper: upper bound of the modifier
+        step_size: size of each step of the walk, up or down
+        seed: seed of the walk's random number generator
+    """
 
-    def __init__(self, lower: float, upper: float, step_size: float):
+    def __init__(self, lower: float, upper: float, step_size: float, seed: Optional[int] = None):
         self.modifier = 1.0
         self.lower = lower
         self.upper = upper
         self.step_size = step_size
+        self.seed(seed)
+
+    def reset(self):
+        """Restart the walk from 1."""
+        self.modifier = 1.0
+
+    def seed(self, seed: Optional[int] = None):
+        """Seed the walk's random number generator."""
+        self.rng = np.random.default_rng(seed)
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the walk's modifier and random state."""
+        return {"modifier": self.modifier, "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        """Restore a snapshot of `get_state`."""
+        self.modifier = state["modifier"]
+        self.rng.bit_generator.state = state["rng"]
 
     def step(self) -> float:
         """Return next modifier."""
-        direction = -1.0 if np.random.random() < 0.5 else +1.0
+        direction = -1.0 if self.rng.random() < 0.5 else +1.0
         self.modifier += direction * self.step_size
         self.modifier = min(self.upper, self.modifier)
         self.modifier = max(self.lower, self.modifier)
         return self.modifier
 
+    def trajectory(self, num_steps: int) -> np.ndarray:
+        """Return the next num_steps modifiers."""
+        steps = np.where(self.rng.random(num_steps) < 0.5, -self.step_size, self.step_size)
+        # Walked in python over the steps drawn at once, as the walk may be clipped at any step.
+        # Linear in num_steps however tight the bounds, and the same modifiers as `step`'s
+        modifier, lower, upper = self.modifier, self.lower, self.upper
+        trajectory = []
+        for step in steps.tolist():
+            modifier += step
+            if modifier > upper:
+                modifier = upper
+            elif modifier < lower:
+                modifier = lower
+            trajectory.append(modifier)
+        self.modifier = modifier
+        return np.array(trajectory, dtype=float)
+
+
+def _modifier_trajectory(modifier: StepperModifier, num_steps: int) -> np.ndarray:
+    trajectory = getattr(modifier, "trajectory", None)
+    if trajectory is None:
+        return np.array([modifier.step() for _ in range(num_steps)], dtype=float)
+    return trajectory(num_steps)
+
+
+class TimestepContextualBernoulliBandits(_BernoulliBanditsEnv):
+    """Env of bandits with contexts that are based on the timestep.
+
+    As the contexts don't depend on the actions, their modifiers are generated `horizon` steps
+    at a time, and served from there. Resetting the env resets its contexts, and seeding it seeds
+    those contexts with their own random number generators.
+    """
 
-class TimestepContextualBernoulliBandits:
-    """Env of bandits with contexts that are based on the timestep."""
-
-    def __init__(self, bandits: List[Bandit], step_contexts: List[StepperModifier]):
+    def __init__(
+        self,
+        bandits: List[Bandit],
+        step_contexts: List[StepperModifier],
+        horizon: int = 4096,
+        episode_length: Optional[int] = None,
+    ):
+        super().__init__(gym.spaces.Discrete(len(bandits)), episode_length)
         self.bandits = bandits
         self.step_contexts = step_contexts
-        self.timestep = 0
 
-        self.action_space = gym.spaces.Discrete(len(bandits))
-        self.observation_space = gym.spaces.Discrete(1)
+        self.context_multipliers = TrajectoryBuffer(self._context_trajectory, horizon)
 
     def step(self, selected_bandit: int) -> StepReturn:
         """Select bandit and receive response."""
         assert self.action_space.contains(selected_bandit)
+        done = self._next_timestep()
+
+        conversion = self.bandits[selected_bandit].action(
+            multiplier=self.context_multipliers.next(), uniform=self.uniforms.next()
+        )
+        return _OBSERVATIONS[conversion], float(conversion), done, {}
 
-        context_multiplier = 1.0
+    def step_many(self, selected_bandits: np.ndarray) -> BatchStepReturn:
+        """Select a bandit at each of many steps, and receive their responses at once.
+
+        Equivalent to calling `step` with each of the selected bandits in turn.
+
+        Returns:
+            tuple of (observations, rewards, dones, info), each array of length of the steps
+        """
+        selected_bandits = np.asarray(selected_bandits)
+        assert ((0 <= selected_bandits) & (selected_bandits < len(self.bandits))).all()
+        dones = self._next_timesteps(len(selected_bandits))
+        context_multipliers = self.context_multipliers.take(len(selected_bandits))
+
+        uniforms = self.uniforms.take(len(selected_bandits))
+        return _batch_step_return(
+            _conversions(self.bandits, selected_bandits, context_multipliers, uniforms), dones
+        )
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """Reset env and its contexts, optionally reseeding them."""
+        observation = super().reset(seed)
         for context in self.step_contexts:
-            context_multiplier *= context.step()
-        self.timestep += 1
+            if hasattr(context, "reset"):
+                context.reset()
+        self.context_multipliers.clear()
+        return observation
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """Seed the env's random number generator, and those of its contexts."""
+        self.uniforms.seed(seed)
+        context_seeds = np.random.SeedSequence(seed).generate_state(len(self.step_contexts))
+        for context, context_seed in zip(self.step_contexts, context_seeds):
+            if hasattr(context, "seed"):
+                context.seed(int(context_seed))
+        self.context_multipliers.clear()
+        return [seed]
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the env's state and its contexts', to restore by `set_state`."""
+        return {
+            **super().get_state(),
+            "context_multipliers": self.context_multipliers.get_state(),
+            "contexts": [
+                context.get_state() if hasattr(context, "get_state") else copy.deepcopy(context)
+                for context in self.step_contexts
+            ],
+        }
+
+    def set_state(self, state: dict):
+        """Restore the env and its contexts to a snapshot of `get_state`."""
+        super().set_state(state)
+        self.context_multipliers.set_state(state["context_multipliers"])
+        contexts = []
+        for context, context_state in zip(self.step_contexts, state["contexts"]):
+            if hasattr(context, "set_state"):
+                context.set_state(context_state)
+            else:
+                context = copy.deepcopy(context_state)
+            contexts.append(context)
+        self.step_contexts = contexts
+
+    def _context_trajectory(self, num_steps: int) -> np.ndarray:
+        multipliers = np.ones(num_steps)
+        for context in self.step_contexts:
+            multipliers *= _modifier_trajectory(context, num_steps)
+        return multipliers
 
-        observation = self.bandits[selected_bandit].action(multiplier=context_multiplier)
-        reward = float(observation)
-        return observation, reward, False, {}
 
+def weekly_with_trend(
+    conversion_rates: Sequence[float] = (0.01, 0.02), episode_length: Optional[int] = None
+) -> TimestepContextualBernoulliBandits:
+    """Make an env of bandits with a random walk trend, and more conversions at weekends.
 
-weekly_with_trend = TimestepContextualBernoulliBandits(
-    [Bandit(0.01), Bandit(0.02)],
-    [RandomWalkTrend(0.8, 1.2, 0.01), Periodicity(weekly_periodicity([1.0] * 5 + [1.2] * 2))],
-)
+    Each env made has its own contexts, so envs don't share any state.
+    """
+    return TimestepContextualBernoulliBandits(
+        [Bandit(conversion_rate) for conversion_rate in conversion_rates],
+        [RandomWalkTrend(0.8, 1.2, 0.01), Periodicity(weekly_periodicity([1.0] * 5 + [1.2] * 2))],
+        episode_length=episode_length,
+    )
+
+
+for bandit_1_conv, bandit_2_conv in [(0.01, 0.02), (0.1, 0.12)]:
+    registry.register(
+        id=f"SingleInteractionStep:Basic:conv_1:{bandit_1_conv}:conv_2:{bandit_2_conv}-v0",
+        entry_point="truman.single_interaction_step:BasicDiscreteBernoulliBandits",
+        kwargs={
+            "bandits": [Bandit(bandit_1_conv), Bandit(bandit_2_conv)],
+            "episode_length": 1000,
+        },
+    )
+    registry.register(
+        id=(
+            "SingleInteractionStep:HeirarchicalStatic:"
+            f"conv_1:{bandit_1_conv}:conv_2:{bandit_2_conv}-v0"
+        ),
+        entry_point="truman.single_interaction_step:HeirarchicalStaticBernoulliBandits",
+        kwargs={
+            "bandits": [Bandit(bandit_1_conv), Bandit(bandit_2_conv)],
+            "context": {"device": {"mobile": 0.8, "desktop": 1.2}},
+            "episode_length": 1000,
+        },
+    )
+    registry.register(
+        id=(
+            "SingleInteractionStep:WeeklyWithTrend:"
+            f"conv_1:{bandit_1_conv}:conv_2:{bandit_2_conv}-v0"
+        ),
+        entry_point="truman.single_interaction_step:weekly_with_trend",
+        kwargs={"conversion_rates": [bandit_1_conv, bandit_2_conv], "episode_length": 1000},
+    )
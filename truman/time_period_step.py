@@ -1,21 +1,30 @@
 """Contains envs which are interacting with cohorts of bandits in each time period."""
 
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from typing_extensions import Protocol
-from truman.typing import StepReturn
+from truman.typing import BatchStepReturn, StepReturn
 
 import functools
 import math
 
 import gym
 import numpy as np
-from scipy import stats
 
 from truman import registry
 
 
 class DiscreteStrategyBinomial(gym.Env):
-    """An env of a discrete set of cohorts of bandits."""
+    """An env of a discrete set of cohorts of bandits.
+
+    With `common_random_numbers`, the responses of every strategy are drawn at each step, and
+    the selected strategy's returned. The env's random stream then doesn't depend on the
+    strategies selected, so envs seeded alike give the same response to the same strategy at the
+    same timestep, whichever agent is selecting them. Comparisons of agents on such envs have far
+    less variance than on independently drawn envs.
+
+    With `precompute_behaviour`, the behaviour of every strategy at every timestep is computed
+    once, up front, rather than calling behaviour_func each step (see `behaviour_table`).
+    """
 
     def __init__(
         self,
@@ -23,11 +32,17 @@ class DiscreteStrategyBinomial(gym.Env):
         episode_length: int,
         strategy_keys: List[str],
         behaviour_func: Callable[[int, int], Tuple[float, float]],
+        common_random_numbers: bool = False,
+        precompute_behaviour: bool = False,
     ):
         self.cohort_size = cohort_size
         self.episode_length = episode_length
         self.strategies = {strategy_key: i for i, strategy_key in enumerate(strategy_keys)}
         self.behaviour_func = behaviour_func
+        self.common_random_numbers = common_random_numbers
+        self.behaviour: Optional[np.ndarray] = None
+        if precompute_behaviour:
+            self.behaviour = behaviour_table(behaviour_func, episode_length, len(strategy_keys))
 
         self.action_space = gym.spaces.Discrete(len(strategy_keys))
         self.observation_space = gym.spaces.Box(low=0, high=999999, shape=(2,), dtype=int)
@@ -42,9 +57,15 @@ class DiscreteStrategyBinomial(gym.Env):
 
         assert self.action_space.contains(selected_strategy)
 
-        interaction_prb, conversion_prb = self.behaviour_func(selected_strategy, self.timestep)
-        num_interactions = stats.binom.rvs(self.cohort_size, interaction_prb)
-        num_conversions = stats.binom.rvs(num_interactions, conversion_prb)
+        if self.behaviour is None:
+            interaction_prb, conversion_prb = self.behaviour_func(selected_strategy, self.timestep)
+        else:
+            interaction_prb, conversion_prb = self.behaviour[self.timestep, selected_strategy]
+        if self.common_random_numbers:
+            num_interactions, num_conversions = self._draw_all_strategies()[:, selected_strategy]
+        else:
+            num_interactions = self.rng.binomial(self.cohort_size, interaction_prb)
+            num_conversions = self.rng.binomial(num_interactions, conversion_prb)
 
         self.timestep += 1
 
@@ -58,14 +79,165 @@ class DiscreteStrategyBinomial(gym.Env):
             {"interaction_prb": interaction_prb, "conversion_prb": conversion_prb},
         )
 
-    def reset(self):
-        """Reset env."""
+    def reset(self, seed: Optional[int] = None):
+        """Reset env, optionally reseeding it."""
+        if seed is not None:
+            self.seed(seed)
         self.timestep = 0
         return np.array([0, 0])
 
-    def seed(self, seed=None):
-        """Seed env."""
-        np.random.seed(seed)
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """Seed the env's random number generator."""
+        self.rng = np.random.default_rng(seed)
+        return [seed]
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the env's timestep and random state, to restore by `set_state`."""
+        return {"timestep": self.timestep, "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        """Restore the env to a snapshot of `get_state`.
+
+        A snapshot can be restored any number of times, e.g. to branch many rollouts from it,
+        without replaying the episode up to it.
+        """
+        self.timestep = state["timestep"]
+        self.rng.bit_generator.state = state["rng"]
+
+    def _draw_all_strategies(self) -> np.ndarray:
+        """Draw the interactions and conversions of every strategy at the current timestep.
+
+        Returns:
+            array of shape (2, num_strategies)
+        """
+        interaction_prb, conversion_prb = _behaviour_at(self, self.timestep).T
+        num_interactions = self.rng.binomial(self.cohort_size, interaction_prb)
+        num_conversions = self.rng.binomial(num_interactions, conversion_prb)
+        return np.stack([num_interactions, num_conversions])
+
+
+class DiscreteStrategyBinomialBatch(gym.Env):
+    """A batch of independent replicas of a DiscreteStrategyBinomial env, stepped together.
+
+    Each step takes an action per replica, and draws the responses of all replicas at once.
+    """
+
+    def __init__(
+        self,
+        num_replicas: int,
+        cohort_size: int,
+        episode_length: int,
+        strategy_keys: List[str],
+        behaviour_func: Callable[[int, int], Tuple[float, float]],
+        precompute_behaviour: bool = False,
+    ):
+        self.num_replicas = num_replicas
+        self.cohort_size = cohort_size
+        self.episode_length = episode_length
+        self.strategies = {strategy_key: i for i, strategy_key in enumerate(strategy_keys)}
+        self.behaviour_func = behaviour_func
+        self.behaviour: Optional[np.ndarray] = None
+        if precompute_behaviour:
+            self.behaviour = behaviour_table(behaviour_func, episode_length, len(strategy_keys))
+
+        self.action_space = gym.spaces.MultiDiscrete([len(strategy_keys)] * num_replicas)
+        self.observation_space = gym.spaces.Box(
+            low=0, high=999999, shape=(num_replicas, 2), dtype=int
+        )
+
+        self.timestep = 0
+        self.seed()
+
+    def step(self, selected_strategies: np.ndarray) -> BatchStepReturn:
+        """Select a strategy for each replica and receive their responses.
+
+        Returns:
+            tuple of (observations of shape (num_replicas, 2), rewards of shape (num_replicas,),
+                dones of shape (num_replicas,), dict of info arrays of shape (num_replicas,))
+        """
+        if self.timestep >= self.episode_length:
+            raise gym.error.ResetNeeded("Environment needs resetting before use.")
+
+        selected_strategies = np.asarray(selected_strategies)
+        assert self.action_space.contains(selected_strategies)
+
+        interaction_prb, conversion_prb = _behaviour_at(self, self.timestep)[selected_strategies].T
+        num_interactions = self.rng.binomial(self.cohort_size, interaction_prb)
+        num_conversions = self.rng.binomial(num_interactions, conversion_prb)
+
+        self.timestep += 1
+
+        observations = np.stack([num_interactions, num_conversions], axis=1)
+        rewards = num_conversions.astype(float)
+        dones = np.full(self.num_replicas, self.timestep >= self.episode_length)
+        return (
+            observations,
+            rewards,
+            dones,
+            {"interaction_prb": interaction_prb, "conversion_prb": conversion_prb},
+        )
+
+    def reset(self, seed: Optional[int] = None):
+        """Reset env, optionally reseeding it."""
+        if seed is not None:
+            self.seed(seed)
+        self.timestep = 0
+        return np.zeros((self.num_replicas, 2), dtype=int)
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """Seed the env's random number generator."""
+        self.rng = np.random.default_rng(seed)
+        return [seed]
+
+    def get_state(self) -> dict:
+        """Return a snapshot of the env's timestep and random state, to restore by `set_state`."""
+        return {"timestep": self.timestep, "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        """Restore the env to a snapshot of `get_state`.
+
+        A snapshot can be restored any number of times, e.g. to branch many rollouts from it,
+        without replaying the episode up to it.
+        """
+        self.timestep = state["timestep"]
+        self.rng.bit_generator.state = state["rng"]
+
+
+@functools.lru_cache(maxsize=128)
+def behaviour_table(
+    behaviour_func: Callable[[int, int], Tuple[float, float]],
+    episode_length: int,
+    num_strategies: int,
+) -> np.ndarray:
+    """Compute the behaviour of every strategy at every timestep of an episode.
+
+    Cached, so envs made from the same spec (and so the same behaviour_func object) share a
+    table. The table is read-only, as it's shared.
+
+    Returns:
+        array of shape (episode_length, num_strategies, 2) of the interaction and conversion
+        probabilities
+    """
+    table = np.array(
+        [
+            [behaviour_func(strategy, timestep) for strategy in range(num_strategies)]
+            for timestep in range(episode_length)
+        ],
+        dtype=float,
+    ).reshape(episode_length, num_strategies, 2)
+    table.flags.writeable = False
+    return table
+
+
+def _behaviour_at(
+    env: Union[DiscreteStrategyBinomial, DiscreteStrategyBinomialBatch], timestep: int
+) -> np.ndarray:
+    """The behaviour of every strategy of the env at the timestep, of shape (num_strategies, 2)."""
+    if env.behaviour is not None:
+        return env.behaviour[timestep]
+    return np.array(
+        [env.behaviour_func(strategy, timestep) for strategy in env.strategies.values()]
+    )
 
 
 class DiscreteStrategyBinomialAgent(Protocol):
@@ -105,6 +277,7 @@ for strat_1_conv, strat_2_conv in [(0.2, 0.3), (0.02, 0.03), (0.002, 0.003)]:
             "cohort_size": 10000,
             "episode_length": 365,
             "strategy_keys": ["a", "b"],
+            "precompute_behaviour": True,
             "behaviour_func": functools.partial(
                 static_interaction,
                 behaviour_params={0: (0.5, strat_1_conv), 1: (0.5, strat_2_conv)},
@@ -132,6 +305,7 @@ for strat_1_conv, strat_2_conv in [(0.2, 0.3), (0.02, 0.03), (0.002, 0.003)]:
             "cohort_size": 10000,
             "episode_length": 365,
             "strategy_keys": ["a", "b"],
+            "precompute_behaviour": True,
             "behaviour_func": functools.partial(
                 matching_sin7_interaction,
                 behaviour_params={0: (0.5, strat_1_conv), 1: (0.5, strat_2_conv)},
@@ -158,6 +332,7 @@ for strat_1_conv, strat_2_conv in [(0.2, 0.3), (0.02, 0.03), (0.002, 0.003)]:
             "cohort_size": 10000,
             "episode_length": 365,
             "strategy_keys": ["a", "b"],
+            "precompute_behaviour": True,
             "behaviour_func": functools.partial(
                 non_stationary_trend_interaction,
                 behaviour_params={0: (0.5, strat_1_conv), 1: (0.5, strat_2_conv)},
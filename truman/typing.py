@@ -1,9 +1,11 @@
 """Truman (gymenv) types."""
 from typing import Any, Tuple
-from typing_extensions import Protocol
+from typing_extensions import Protocol, runtime_checkable
 
 
 StepReturn = Tuple[Any, float, bool, dict]
+# Observations, rewards, dones and info of a batch of envs, each with a leading batch dimension
+BatchStepReturn = Tuple[Any, Any, Any, dict]
 
 
 class Agent(Protocol):
@@ -16,3 +18,21 @@ class Agent(Protocol):
             tuple of (chosen action, dict of any extra information)
         """
         ...
+
+
+@runtime_checkable
+class BatchAgent(Protocol):
+    """Protocol that agents acting on a batch of env replicas at once should implement."""
+
+    def act_batch(self, previous_observations) -> Tuple[Any, dict]:
+        """Choose an action for each replica given the previous observation of each.
+
+        Args:
+            previous_observations: the observations of every replica, with a leading replica
+                dimension
+
+        Returns:
+            tuple of (chosen actions, with a leading replica dimension, dict of any extra
+                information, each an array with a leading replica dimension)
+        """
+        ...